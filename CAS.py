@@ -1,11 +1,21 @@
 import streamlit as st
 import os
-import random
+import threading
 import json
-from utils import get_answer, text_to_speech, autoplay_audio, speech_to_text
+import uuid
+from contextlib import closing
+from utils import stream_answer, text_to_speech_pipelined, play_audio_segments, speech_to_text, summarize_conversation, load_config
 from audio_recorder_streamlit import audio_recorder
 from streamlit_float import *
-from sentence_transformers import SentenceTransformer, util
+from utilities.embeddings import cached_encoder, cosine_similarity, paired_cosine_similarity
+from utilities.models import DEFAULT_MODEL_NAME, encoder_id, get_batching_encoder
+from utilities.context import ConversationContext
+from utilities.stt import backend_for
+from utilities.metrics import timed
+from utilities.interview_plan import make_interview_plan, new_session_seed
+from utilities.question_bank import get_question_bank
+from utilities.reference_answers import get_reference_store
+from utilities.session_store import get_session_store, sign_session_id, verify_session_id
 
 st.set_page_config(
     page_title="Interview Bot",
@@ -17,12 +27,15 @@ st.set_page_config(
 # Float feature initialization
 float_init()
 
-# Load questions from JSON file
-with open("koshen.json", "r", encoding="utf-8") as file:
-    questions_data = json.load(file)
+# Get the process-wide NLP model for semantic similarity (loaded once; encodes from all sessions run in shared batches)
+model = get_batching_encoder(DEFAULT_MODEL_NAME)
+encoder = cached_encoder(model, encoder_id(DEFAULT_MODEL_NAME))
 
-# Initialize the NLP model for semantic similarity
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Load questions from JSON file with their precomputed embeddings (rebuilt only when the file changes)
+question_bank = get_question_bank("koshen.json", encoder.encode_many, encoder.model_name)
+
+# Load reference answers generated offline by `python -m utilities.reference_answers` (None until generated)
+reference_store = get_reference_store("reference_answers.json", encoder.encode_many, encoder.model_name)
 
 # Define interview scenarios, levels, and their respective system prompts
 scenarios = {
@@ -83,9 +96,58 @@ content = {
 
 levels = ["Beginner", "Intermediate", "Hard"]
 
+# Token budget for the conversation sent to the LLM on each turn (summary plus latest turns)
+context_budgets = {
+    "Java Interview": 2000,
+    "Excel Interview": 2000,
+    "Python Interview": 2000,
+    "Kotlin Interview": 2000,
+    "ReactJS Interview": 2000
+}
+
 EVALUATION_THRESHOLD = 0.6  # Set the evaluation metric threshold here
 
+# Interview state kept in the shared session store, so any replica can resume a session after a reconnect or restart
+PERSISTED_KEYS = ("messages", "selected_scenario", "selected_level", "answers", "answer_questions", "level_progress", "incorrect_attempts", "max_questions", "current_question", "introduction_given", "user_introduction", "session_seed")
+# Signs the session ids in page URLs. Without a secret of its own (the cookie key in config.yaml is committed and
+# public, so ids signed with it could be forged) interviews are not persisted and only live as long as the browser tab
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+PERSISTENCE_ENABLED = bool(SESSION_SECRET) and SESSION_SECRET != load_config()["cookie"]["key"]
+session_store = get_session_store() if PERSISTENCE_ENABLED else None
+
+# Function to get the session id carried in the page URL, so a reconnecting browser finds its stored state.
+# The id is signed for the logged-in user, so a shared or leaked URL does not open the interview for anyone else.
+def get_session_id():
+    user = st.session_state.get("username") or ""
+    session_id = verify_session_id(st.query_params.get("sid"), SESSION_SECRET, user)
+    if session_id is None:
+        session_id = uuid.uuid4().hex
+        st.query_params["sid"] = sign_session_id(session_id, SESSION_SECRET, user)
+    return session_id
+
+# Function to queue the persisted keys for a write-behind save when they changed since the last save
+@timed("cas.persist_session")
+def persist_session():
+    if not PERSISTENCE_ENABLED:
+        return
+    state = {key: st.session_state[key] for key in PERSISTED_KEYS}
+    snapshot = json.dumps(state, sort_keys=True)
+    if snapshot == st.session_state.store_snapshot:
+        return
+    st.session_state.store_version += 1
+    st.session_state.store_snapshot = snapshot
+    session_store.save(st.session_state.session_id, st.session_state.store_version, state)
+
 def initialize_session_state():
+    if "session_id" not in st.session_state and PERSISTENCE_ENABLED:
+        st.session_state.session_id = get_session_id()
+        stored = session_store.load(st.session_state.session_id)
+        st.session_state.store_version, st.session_state.store_snapshot = 0, None
+        if stored is not None:
+            version, state = stored
+            st.session_state.update(state)
+            st.session_state.store_version = version
+            st.session_state.store_snapshot = json.dumps(state, sort_keys=True)
     if "messages" not in st.session_state:
         st.session_state.messages = [{"role": "assistant", "content": content["Java Interview"]["Beginner"]}]
     if "selected_scenario" not in st.session_state:
@@ -94,6 +156,8 @@ def initialize_session_state():
         st.session_state.selected_level = "Beginner"
     if "answers" not in st.session_state:
         st.session_state.answers = []
+    if "answer_questions" not in st.session_state:
+        st.session_state.answer_questions = []  # Question index each entry of answers replied to
     if "level_progress" not in st.session_state:
         st.session_state.level_progress = {"Java Interview": "Beginner", "Excel Interview": "Beginner", "Python Interview": "Beginner", "Kotlin Interview": "Beginner", "ReactJS Interview": "Beginner"}
     if "incorrect_attempts" not in st.session_state:
@@ -106,8 +170,17 @@ def initialize_session_state():
         st.session_state.introduction_given = False
     if "user_introduction" not in st.session_state:
         st.session_state.user_introduction = ""
+    if "session_seed" not in st.session_state:
+        st.session_state.session_seed = new_session_seed()
+    if "context" not in st.session_state:
+        st.session_state.context = ConversationContext(summarize_conversation)
+    if "stop_event" not in st.session_state:
+        st.session_state.stop_event = threading.Event()
+    persist_session()
 
 initialize_session_state()
+if not PERSISTENCE_ENABLED:
+    st.warning("Session persistence is disabled: set SESSION_SECRET to a secret of its own to let interviews survive reconnects and restarts.")
 
 st.title("Interview Bot 🤖")
 
@@ -148,6 +221,11 @@ with col2:
 with col3:
     # End session button
     if st.button("End Session"):
+        # Cancel a reply that may still be streaming in the previous run
+        st.session_state.stop_event.set()
+        if PERSISTENCE_ENABLED:
+            session_store.delete(st.session_state.session_id)
+            del st.query_params["sid"]
         st.session_state.clear()
         initialize_session_state()
         st.rerun()
@@ -158,72 +236,100 @@ with col4:
         "Max Questions",
         min_value=2,
         max_value=10,
-        value=5
+        value=st.session_state.max_questions
     )
 
 # Update the session state if the scenario changes
 if selected_scenario != st.session_state.selected_scenario:
     st.session_state.selected_scenario = selected_scenario
     st.session_state.selected_level = "Beginner"
+    st.session_state.context.reset()
     st.session_state.messages = [{"role": "assistant", "content": content[selected_scenario]["Beginner"]}]
     st.session_state.answers = []
+    st.session_state.answer_questions = []
     st.session_state.incorrect_attempts = 0
     st.session_state.current_question = 0
     st.session_state.introduction_given = False
     st.session_state.user_introduction = ""
+persist_session()
 
-def get_random_questions(scenario, level, num_questions):
-    questions = questions_data[scenario][level]
-    selected_questions = random.sample(questions, num_questions)
-    return selected_questions
+# Function to get the interview plan, generated once per (session, scenario, level) so the system prompt stays byte-identical across reruns
+def get_interview_plan(scenario, level, num_questions):
+    prompt_template = scenarios[scenario][st.session_state.level_progress[scenario]]
+    plan = st.session_state.get("interview_plan")
+    if plan is None or not plan.matches(scenario, level, num_questions, prompt_template):
+        plan = make_interview_plan(st.session_state.session_seed, scenario, level, num_questions, question_bank, prompt_template)
+        st.session_state.interview_plan = plan
+    return plan
 
-system_prompt = scenarios[selected_scenario][st.session_state.level_progress[selected_scenario]].format(max_questions=st.session_state.max_questions, question_list=get_random_questions(st.session_state.selected_scenario, st.session_state.selected_level, st.session_state.max_questions))
+interview_plan = get_interview_plan(st.session_state.selected_scenario, st.session_state.selected_level, st.session_state.max_questions)
+system_prompt = interview_plan.system_prompt
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.write(message["content"])
 
 if audio_bytes:
-    # Write the audio bytes to a file
+    # Transcribe the recording straight from memory
     with st.spinner("Transcribing..."):
-        webm_file_path = "temp_audio.mp3"
-        with open(webm_file_path, "wb") as f:
-            f.write(audio_bytes)
-
-        transcript = speech_to_text(webm_file_path)
+        transcript = speech_to_text(audio_bytes, backend=backend_for("interview"))
         if transcript:
             st.session_state.messages.append({"role": "user", "content": transcript})
             if st.session_state.introduction_given:
                 st.session_state.answers.append(transcript)  # Store the user's answer
+                st.session_state.answer_questions.append(st.session_state.current_question)
             else:
                 st.session_state.user_introduction = transcript  # Save the user's introduction
                 st.session_state.introduction_given = True
+            persist_session()
             with st.chat_message("user"):
                 st.write(transcript)
-            os.remove(webm_file_path)
 
 if st.session_state.messages[-1]["role"] != "assistant" and st.session_state.introduction_given:
     with st.chat_message("assistant"):
-        with st.spinner("Thinking🤔..."):
-            final_response = get_answer(st.session_state.messages, system_prompt)
-        with st.spinner("Generating audio response..."):
-            audio_file = text_to_speech(final_response)
-            autoplay_audio(audio_file)
-        st.write(final_response)
+        stop_event = st.session_state.stop_event
+        st.session_state.context.token_budget = context_budgets[selected_scenario]
+        context_messages = st.session_state.context.build(st.session_state.messages)
+        with closing(stream_answer(context_messages, system_prompt, stop_event)) as tokens:
+            final_response = st.write_stream(tokens)
+        if stop_event.is_set():
+            st.stop()
         st.session_state.messages.append({"role": "assistant", "content": final_response})
-        os.remove(audio_file)
+        persist_session()
+        # The first sentence starts playing while the rest are still being synthesized
+        play_audio_segments(text_to_speech_pipelined(final_response))
 
 # Evaluation function
+@timed("cas.evaluate_answers")
 def evaluate_answers(user_answers):
-    scores = []
-    for user_answer, assistant_msg in zip(user_answers, st.session_state.messages):
-        if assistant_msg["role"] == "assistant":
-            expected_answer = assistant_msg["content"]
-            score = semantic_similarity(user_answer, expected_answer)
-            scores.append(score)
+    answer_questions = st.session_state.answer_questions
+    graded = []
+    for index, user_answer in enumerate(user_answers):
+        # Sessions saved before answers recorded their question index fall back to the answer's position in the plan
+        question = plan_question(answer_questions[index] if index < len(answer_questions) else index)
+        if question is not None:  # None marks the introduction, which answers no plan question
+            graded.append((user_answer.strip().lower(), question))
+    if not graded:
+        return []
+    answers, questions = zip(*graded)
+
+    # Grade each answer against its question's reference answers; questions without any are compared with the answer directly
+    scores = batch_reference_scores(list(answers), list(questions))
+    missing = [index for index, score in enumerate(scores) if score is None]
+    if missing:
+        fallback = batch_semantic_similarity([answers[index] for index in missing], [questions[index] for index in missing])
+        for index, score in zip(missing, fallback):
+            scores[index] = score
     return scores
 
+# Function to get the plan question at a question index. Assumes the LLM asks the plan's questions in the order
+# they appear in the system prompt: current_question only counts finished questions, not which one was asked
+def plan_question(index):
+    questions = interview_plan.questions
+    return questions[min(index, len(questions) - 1)] if questions and index is not None else None
+
 # Handle answer function
+@timed("cas.handle_answer")
 def handle_answer(user_answer):
     expected_answer = st.session_state.messages[-1]["content"]
     user_answer_clean = user_answer.strip().lower()
@@ -231,8 +337,11 @@ def handle_answer(user_answer):
 
     if not user_answer_clean or "explain" in user_answer_clean or "again" in user_answer_clean:
         return "not an answer", 0.0
-    
-    score = semantic_similarity(user_answer_clean, expected_answer_clean)
+
+    # Grade against the current question's reference answers; fall back to the last message if it has none
+    score = reference_score(user_answer_clean, plan_question(st.session_state.current_question))
+    if score is None:
+        score = semantic_similarity(user_answer_clean, expected_answer_clean)
     if score >= EVALUATION_THRESHOLD:
         st.session_state.incorrect_attempts = 0
         return "correct", score
@@ -246,11 +355,35 @@ def handle_answer(user_answer):
             return "incorrect", score
 
 # Function to calculate semantic similarity
+@timed("cas.semantic_similarity")
 def semantic_similarity(user_answer, expected_answer):
-    embeddings1 = model.encode(user_answer, convert_to_tensor=True)
-    embeddings2 = model.encode(expected_answer, convert_to_tensor=True)
-    cosine_scores = util.pytorch_cos_sim(embeddings1, embeddings2)
-    return cosine_scores.item()
+    embeddings1, embeddings2 = encoder.encode_many([user_answer, expected_answer])
+    return cosine_similarity(embeddings1, embeddings2)
+
+# Function to score an answer as its best cosine similarity over the question's precomputed reference answers
+@timed("cas.reference_score")
+def reference_score(user_answer, question):
+    if reference_store is None or question is None or not reference_store.has(question):
+        return None
+    return reference_store.score(encoder.encode(user_answer), question)
+
+# Function to reference-score many answers with one batched encode; None where the question has no references
+@timed("cas.batch_reference_scores")
+def batch_reference_scores(user_answers, questions):
+    scored = [index for index, question in enumerate(questions) if reference_store is not None and question is not None and reference_store.has(question)]
+    scores = [None] * len(user_answers)
+    if scored:
+        embeddings = encoder.encode_many([user_answers[index] for index in scored])
+        for index, embedding in zip(scored, embeddings):
+            scores[index] = reference_store.score(embedding, questions[index])
+    return scores
+
+# Function to score many answer/reference pairs with one batched encode per side
+@timed("cas.batch_semantic_similarity")
+def batch_semantic_similarity(user_answers, expected_answers):
+    embeddings1 = encoder.encode_many(user_answers)
+    embeddings2 = encoder.encode_many(expected_answers)
+    return paired_cosine_similarity(embeddings1, embeddings2).tolist()
 
 def process_answer():
     user_answer = st.session_state.answers[-1]
@@ -269,6 +402,8 @@ def process_answer():
     elif result == "not an answer":
         st.write("Please provide a relevant answer.")
     
+    persist_session()
+
     progress_percent = (st.session_state.current_question / st.session_state.max_questions)
     progress.progress(progress_percent)
 
@@ -284,13 +419,16 @@ def evaluate_session():
         if next_level:
             st.session_state.level_progress[selected_scenario] = next_level
             st.session_state.selected_level = next_level
+            st.session_state.context.reset()
             st.session_state.messages = [
                 {"role": "assistant", "content": f"Interview complete. You are moving to the {next_level} level."},
                 {"role": "user", "content": st.session_state.user_introduction}
             ]
             st.session_state.answers = [st.session_state.user_introduction]
+            st.session_state.answer_questions = [None]  # The introduction answers no plan question
             st.session_state.incorrect_attempts = 0
             st.session_state.current_question = 0
+            persist_session()
             st.rerun()
         else:
             st.write("You have completed all levels. Congratulations!")
@@ -298,12 +436,15 @@ def evaluate_session():
         st.write("You did not pass. Please try again from the beginner level.")
         st.session_state.level_progress[selected_scenario] = "Beginner"
         st.session_state.selected_level = "Beginner"
+        st.session_state.context.reset()
         st.session_state.messages = [{"role": "assistant", "content": content[selected_scenario]["Beginner"]}]
         st.session_state.answers = []
+        st.session_state.answer_questions = []
         st.session_state.incorrect_attempts = 0
         st.session_state.current_question = 0
         st.session_state.introduction_given = False
         st.session_state.user_introduction = ""
+        persist_session()
 
 if st.session_state.introduction_given and len(st.session_state.answers) > 0:
     process_answer()
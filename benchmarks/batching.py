@@ -0,0 +1,63 @@
+"""
+Encode throughput under concurrent sessions: each thread plays one candidate
+encoding single answers, either straight through the model or through the
+shared BatchingEncoder.
+
+    python -m benchmarks.batching --threads 1,4,16 --seconds 5
+"""
+import argparse
+import sys
+import threading
+import time
+
+from benchmarks.encoder import parity_texts
+from utilities.batching import BatchingEncoder
+
+
+def measure(encode, threads, seconds, texts):
+    counts = [0] * threads
+    stop = threading.Event()
+
+    def session(index):
+        while not stop.is_set():
+            encode(texts[(index * 7 + counts[index]) % len(texts)])
+            counts[index] += 1
+
+    workers = [threading.Thread(target=session, args=(index,), daemon=True) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default=None, help="torch or onnx (default: $SENTENCE_BACKEND)")
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    from utilities.models import get_sentence_model
+    model = get_sentence_model(args.model, args.backend)
+    batcher = BatchingEncoder(model, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000.0)
+    texts = parity_texts()
+
+    print(f"{'threads':>8}{'direct/s':>12}{'batched/s':>12}{'mean batch':>12}")
+    for threads in [int(value) for value in args.threads.split(",")]:
+        direct = measure(lambda text: model.encode([text], convert_to_numpy=True), threads, args.seconds, texts)
+        batches, requests = batcher.batches, batcher.requests
+        batched = measure(lambda text: batcher.encode([text]), threads, args.seconds, texts)
+        mean_batch = (batcher.requests - requests) / max(batcher.batches - batches, 1)
+        print(f"{threads:>8}{direct:>12.1f}{batched:>12.1f}{mean_batch:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Sentence encoder backends compared: load time, per-call latency, peak RSS and
+cosine drift of the int8 ONNX encoder against full-precision PyTorch.
+
+Each backend runs in its own interpreter so import cost and memory are measured
+in isolation. Exits non-zero when the drift exceeds --max-drift.
+
+    python -m benchmarks.encoder --iterations 200
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+QUANTILES = {"p50": 50, "p95": 95, "p99": 99}
+
+EXTRA_TEXTS = [
+    "polymorphism lets one interface have many implementations chosen at runtime",
+    "a constructor initializes a new object and has the same name as the class",
+    "I use a pivot table to summarize sales by region and month",
+    "um I think inheritance is when a class gets the fields and methods of another class",
+    "",
+]
+
+
+# Helper function to build the parity corpus: every koshen.json question plus answer-like sentences
+def parity_texts(questions_path="koshen.json"):
+    with open(questions_path, encoding="utf-8") as f:
+        questions = json.load(f)
+    texts = [question for levels in questions.values() for level_questions in levels.values() for question in level_questions]
+    return texts + EXTRA_TEXTS
+
+
+def run_worker(model_name, backend, iterations, texts_path, output_path):
+    started = time.perf_counter()
+    from utilities.models import get_sentence_model
+    model = get_sentence_model(model_name, backend)
+    load_seconds = time.perf_counter() - started
+
+    with open(texts_path, encoding="utf-8") as f:
+        texts = json.load(f)
+    np.save(output_path, np.asarray(model.encode(texts, convert_to_numpy=True), dtype=np.float32))
+
+    # Single-sentence calls are what CAS.py and the Flask app issue per answer
+    latencies = []
+    for iteration in range(iterations):
+        text = texts[iteration % len(texts)]
+        call_started = time.perf_counter()
+        model.encode(text, convert_to_tensor=False)
+        latencies.append(time.perf_counter() - call_started)
+
+    batch_started = time.perf_counter()
+    model.encode(texts, convert_to_numpy=True)
+    latencies_ms = np.asarray(latencies) * 1000.0
+    result = {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "batch_ms": round((time.perf_counter() - batch_started) * 1000.0, 2),
+        "batch_size": len(texts),
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+    result.update({label: round(float(np.percentile(latencies_ms, q)), 3) for label, q in QUANTILES.items()})
+    print(json.dumps(result))
+
+
+def run_backend(model_name, backend, iterations, texts_path, output_path):
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.encoder", "--model", model_name, "--worker", backend, "--iterations", str(iterations), "--texts", texts_path, "--embeddings", output_path],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# Function to measure how far the candidate's embeddings drift from the reference, as 1 - cosine per text
+def cosine_drift(reference, candidate):
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate = candidate / np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    return 1.0 - np.einsum("ij,ij->i", reference, candidate)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--backends", default="torch,onnx")
+    parser.add_argument("--max-drift", type=float, default=0.02, help="Largest allowed 1 - cosine between backends for any text")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--texts", help=argparse.SUPPRESS)
+    parser.add_argument("--embeddings", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.model, args.worker, args.iterations, args.texts, args.embeddings)
+        return 0
+
+    backends = args.backends.split(",")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        texts_path = os.path.join(tmp_dir, "texts.json")
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(parity_texts(), f)
+        embeddings = {}
+        for backend in backends:
+            output_path = os.path.join(tmp_dir, f"{backend}.npy")
+            results[backend] = run_backend(args.model, backend, args.iterations, texts_path, output_path)
+            embeddings[backend] = np.load(output_path)
+
+    print(f"{'backend':<10}{'load s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'batch ms':>10}{'RSS MB':>10}")
+    for backend in backends:
+        r = results[backend]
+        print(f"{backend:<10}{r['load_seconds']:>10.2f}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}{r['batch_ms']:>10.1f}{r['peak_rss_mb']:>10.1f}")
+
+    status = 0
+    reference = backends[0]
+    for backend in backends[1:]:
+        drift = cosine_drift(embeddings[reference], embeddings[backend])
+        results[backend]["max_drift"] = round(float(drift.max()), 5)
+        results[backend]["mean_drift"] = round(float(drift.mean()), 5)
+        print(f"{backend} vs {reference}: max drift {drift.max():.5f}, mean drift {drift.mean():.5f} over {len(drift)} texts")
+        if drift.max() > args.max_drift:
+            print(f"PARITY FAILURE {backend}: max drift {drift.max():.5f} > {args.max_drift}")
+            status = 1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
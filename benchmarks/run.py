@@ -0,0 +1,261 @@
+"""
+Per-turn latency benchmark for the voice interview pipeline.
+
+Runs utils.speech_to_text, stream_answer/get_answer, text_to_speech and the
+sentence-embedding similarity against a local stub provider server, then
+reports p50/p95/p99 per stage and end to end. A second run sends chat requests
+through a HedgedRouter whose Groq primary is occasionally slow, so the hedge
+path and its adaptive delay are exercised too.
+
+    python -m benchmarks.run --iterations 50 --output bench.json
+    python -m benchmarks.run --baseline bench.json --tolerance 0.1
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+from benchmarks.stub_server import StubConfig, StubServer
+
+QUANTILES = {"p50": 50, "p95": 95, "p99": 99}
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name].append(time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.timings[name].append(seconds)
+
+    def summary(self):
+        summary = {}
+        for name, values in self.timings.items():
+            values_ms = np.asarray(values) * 1000.0
+            summary[name] = {label: round(float(np.percentile(values_ms, q)), 2) for label, q in QUANTILES.items()}
+            summary[name]["mean"] = round(float(values_ms.mean()), 2)
+            summary[name]["count"] = len(values)
+        return summary
+
+
+# Helper function to build a deterministic spoken-answer stand-in: silence, a tone, then the recorder's trailing pause
+def make_recording(seconds=3.0, sample_rate=44100):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t)
+    samples = np.concatenate([np.zeros(sample_rate // 2), tone, np.zeros(int(sample_rate * 2.5))])
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(sample_rate)
+        clip.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def configure_environment(server, cache_dir):
+    os.environ.update({
+        "OPENAI_BASE_URL": server.openai_base_url,
+        "GROQ_BASE_URL": server.groq_base_url,
+        "OPENAI_API_KEY": "stub",
+        "GROQ_API_KEY": "stub",
+        "TTS_CACHE_DIR": cache_dir,
+    })
+
+
+def run_benchmark(iterations, config, with_embedding=True):
+    server = StubServer(config).start()
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        configure_environment(server, cache_dir)
+        import utils
+        encoder = None
+        if with_embedding:
+            from utilities.embeddings import cached_encoder, cosine_similarity
+            from utilities.models import DEFAULT_MODEL_NAME, encoder_id, get_batching_encoder
+            encoder = cached_encoder(get_batching_encoder(DEFAULT_MODEL_NAME), encoder_id(DEFAULT_MODEL_NAME))
+
+        recording = make_recording()
+        system_prompt = "You are an experienced interviewer conducting a Java programming interview session with the user."
+        messages = [{"role": "assistant", "content": "Welcome to the beginner level Java interview."}]
+
+        try:
+            for iteration in range(iterations):
+                # CAS.py turn: transcribe, stream the reply, synthesize it, score the answer
+                turn_started = time.perf_counter()
+                with recorder.stage("cas_turn"):
+                    with recorder.stage("speech_to_text"):
+                        transcript = utils.speech_to_text(recording, backend="remote")
+                    turn_messages = messages + [{"role": "user", "content": f"{transcript} {iteration}"}]
+
+                    started = time.perf_counter()
+                    tokens = []
+                    for token in utils.stream_answer(turn_messages, system_prompt):
+                        if not tokens:
+                            recorder.add("llm_first_token", time.perf_counter() - started)
+                        tokens.append(token)
+                    recorder.add("llm_stream", time.perf_counter() - started)
+                    reply = "".join(tokens)
+
+                    # A fresh suffix per iteration keeps the TTS cache from hiding synthesis time
+                    with recorder.stage("text_to_speech_pipelined"):
+                        first = True
+                        for _ in utils.text_to_speech_pipelined(f"{reply} Turn {iteration}. Next question please."):
+                            if first:
+                                recorder.add("cas_turn_first_audio", time.perf_counter() - turn_started)
+                                first = False
+
+                    if encoder is not None:
+                        with recorder.stage("semantic_similarity"):
+                            embeddings = encoder.encode_many([f"{transcript} {iteration}", reply])
+                            cosine_similarity(embeddings[0], embeddings[1])
+
+                # Paths step: transcribe and judge the answer
+                with recorder.stage("paths_step"):
+                    with recorder.stage("speech_to_text"):
+                        transcript = utils.speech_to_text(recording, backend="remote")
+                    with recorder.stage("get_answer"):
+                        utils.get_answer([{"role": "user", "content": f"{transcript} {iteration}"}], "Reply with 'Well Done' or 'Try again'.")
+
+                with recorder.stage("text_to_speech"):
+                    utils.text_to_speech(f"Question {iteration}: what is polymorphism?")
+        finally:
+            server.stop()
+    return recorder.summary()
+
+
+# Function to measure time to first token through the hedged router when a fraction of primary requests stall
+def run_hedge_benchmark(iterations, config):
+    from groq import AsyncGroq
+    from openai import AsyncOpenAI
+    from utilities.router import ChatProvider, HedgedRouter
+
+    server = StubServer(config).start()
+    recorder = Recorder()
+    messages = [{"role": "user", "content": "What is polymorphism?"}]
+
+    async def run():
+        router = HedgedRouter(
+            ChatProvider("groq", AsyncGroq(api_key="stub", base_url=server.groq_base_url), "stub-primary"),
+            ChatProvider("openai", AsyncOpenAI(api_key="stub", base_url=server.openai_base_url), "stub-secondary"),
+        )
+        for _ in range(iterations):
+            started = time.perf_counter()
+            tokens = router.stream(messages)
+            try:
+                await tokens.__anext__()
+                recorder.add("hedged_first_token", time.perf_counter() - started)
+            finally:
+                await tokens.aclose()
+        return router
+
+    try:
+        router = asyncio.run(run())
+    finally:
+        server.stop()
+    print(f"hedged {router.hedges}/{iterations} requests, wins {router.wins}, final hedge delay {router.hedge_delay() * 1000:.0f} ms")
+    return recorder.summary()
+
+
+# Function to list stages whose quantiles got slower than the baseline by more than the tolerance
+def compare(summary, baseline, tolerance=0.1, min_delta_ms=1.0):
+    regressions = []
+    for stage, stats in summary.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        for label in QUANTILES:
+            delta = stats[label] - base[label]
+            if delta > min_delta_ms and stats[label] > base[label] * (1 + tolerance):
+                regressions.append((stage, label, base[label], stats[label]))
+    return regressions
+
+
+def print_summary(summary, baseline=None):
+    print(f"{'stage':<26}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}{'n':>6}")
+    for stage in sorted(summary):
+        stats = summary[stage]
+        row = f"{stage:<26}" + "".join(f"{stats[label]:>10.1f}" for label in ("p50", "p95", "p99", "mean")) + f"{stats['count']:>6}"
+        if baseline and stage in baseline:
+            row += f"   (p95 baseline {baseline[stage]['p95']:.1f})"
+        print(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chat-first-token", type=float, default=0.3, help="Stub LLM time to first token (s)")
+    parser.add_argument("--chat-token-interval", type=float, default=0.02, help="Stub LLM delay between tokens (s)")
+    parser.add_argument("--chat-tokens", type=int, default=40)
+    parser.add_argument("--stt-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.35)
+    parser.add_argument("--tts-bytes", type=int, default=24000)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--skip-embedding", action="store_true", help="Do not load the sentence encoder")
+    parser.add_argument("--hedge-iterations", type=int, default=100, help="Requests in the slow-primary hedging run (0 to skip)")
+    parser.add_argument("--slow-fraction", type=float, default=0.03, help="Fraction of primary requests that stall in the hedging run")
+    parser.add_argument("--slow-first-token", type=float, default=3.0, help="Time to first token of a stalled primary request (s)")
+    parser.add_argument("--output", help="Write the summary as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a summary written by --output")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown before a stage is a regression")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(
+        chat_first_token=args.chat_first_token,
+        chat_token_interval=args.chat_token_interval,
+        chat_tokens=args.chat_tokens,
+        stt_latency=args.stt_latency,
+        tts_latency=args.tts_latency,
+        tts_bytes=args.tts_bytes,
+        jitter=args.jitter,
+        seed=args.seed,
+    )
+    summary = run_benchmark(args.iterations, config, with_embedding=not args.skip_embedding)
+    if args.hedge_iterations:
+        hedge_config = StubConfig(
+            chat_first_token=args.chat_first_token,
+            chat_token_interval=args.chat_token_interval,
+            chat_tokens=args.chat_tokens,
+            jitter=args.jitter,
+            seed=args.seed,
+            groq_slow_fraction=args.slow_fraction,
+            groq_slow_first_token=args.slow_first_token,
+        )
+        summary.update(run_hedge_benchmark(args.hedge_iterations, hedge_config))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if baseline:
+        regressions = compare(summary, baseline, args.tolerance)
+        for stage, label, before, after in regressions:
+            print(f"REGRESSION {stage} {label}: {before:.1f} ms -> {after:.1f} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
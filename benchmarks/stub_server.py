@@ -0,0 +1,142 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    """
+    Latency and payload settings for the stub provider server.
+
+    All latencies are in seconds; jitter is a uniform +/- fraction of the base
+    value drawn from a seeded generator so runs are repeatable. A groq_slow_fraction
+    of Groq chat requests take groq_slow_first_token to their first token instead,
+    giving the hedged router a slow primary to route around.
+    """
+
+    def __init__(self, chat_first_token=0.3, chat_token_interval=0.02, chat_tokens=40,
+                 stt_latency=0.4, tts_latency=0.35, tts_bytes=24000, jitter=0.2, seed=0,
+                 groq_slow_fraction=0.0, groq_slow_first_token=3.0):
+        self.chat_first_token = chat_first_token
+        self.chat_token_interval = chat_token_interval
+        self.chat_tokens = chat_tokens
+        self.stt_latency = stt_latency
+        self.tts_latency = tts_latency
+        self.tts_bytes = tts_bytes
+        self.jitter = jitter
+        self.groq_slow_fraction = groq_slow_fraction
+        self.groq_slow_first_token = groq_slow_first_token
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, base):
+        with self._lock:
+            return max(0.0, base * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def first_token_delay(self, groq):
+        with self._lock:
+            slow = groq and self._random.random() < self.groq_slow_fraction
+        return self.delay(self.groq_slow_first_token if slow else self.chat_first_token)
+
+
+def make_handler(config):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.endswith("/chat/completions"):
+                try:
+                    self.chat(json.loads(body or b"{}"))
+                except (BrokenPipeError, ConnectionResetError):
+                    # The hedged router closes the losing request's stream
+                    self.close_connection = True
+            elif self.path.endswith("/audio/transcriptions"):
+                time.sleep(config.delay(config.stt_latency))
+                self.send_body(b"stub transcription of the recorded answer", "text/plain")
+            elif self.path.endswith("/audio/speech"):
+                time.sleep(config.delay(config.tts_latency))
+                self.send_body(b"\xff\xf3" + b"\x00" * (config.tts_bytes - 2), "audio/mpeg")
+            else:
+                self.send_error(404)
+
+        def chat(self, request):
+            words = [f"word{i} " for i in range(config.chat_tokens - 1)] + ["done."]
+            # The Groq SDK posts to /openai/v1/chat/completions, the OpenAI SDK to /v1/chat/completions
+            time.sleep(config.first_token_delay(self.path.startswith("/openai/")))
+            if not request.get("stream"):
+                time.sleep(config.chat_token_interval * (len(words) - 1))
+                response = {
+                    "id": "stub", "object": "chat.completion", "created": 0, "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(words)}}],
+                }
+                self.send_body(json.dumps(response).encode("utf-8"), "application/json")
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for index, word in enumerate(words):
+                if index:
+                    time.sleep(config.chat_token_interval)
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                }
+                self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+
+        def write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def send_body(self, data, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer:
+    """
+    Local stand-in for the OpenAI and Groq HTTP APIs.
+
+    Point OPENAI_BASE_URL at openai_base_url and GROQ_BASE_URL at groq_base_url
+    before importing utils.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or StubConfig()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.config))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self):
+        return f"{self.base_url}/v1"
+
+    @property
+    def groq_base_url(self):
+        return self.base_url
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
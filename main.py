@@ -1,5 +1,13 @@
 import streamlit as st
 from utils import load_config, init_authenticator
+from utilities.models import preload
+
+# Start loading the sentence encoder while the user logs in; cached so reruns don't start another preload thread
+@st.cache_resource
+def start_preload():
+    return preload()
+
+start_preload()
 
 # Load configuration
 config = load_config()
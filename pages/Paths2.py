@@ -1,14 +1,20 @@
 import streamlit as st
 import json
 import os
-import tempfile
 import string
 from datetime import datetime, timedelta
 from fuzzywuzzy import fuzz
 from dotenv import load_dotenv
 from audio_recorder_streamlit import audio_recorder
-from utils import speech_to_text, text_to_speech, get_answer, autoplay_audio
+from utils import speech_to_text, text_to_speech, get_answer, stream_answer, autoplay_audio, text_to_speech_pipelined, play_audio_segments, summarize_conversation
+from utilities.context import ConversationContext
+from utilities.embeddings import cached_encoder
+from utilities.models import DEFAULT_MODEL_NAME, encoder_id, get_batching_encoder
+from utilities.response_cache import ResponseCache
+from utilities.stt import backend_for
+from utilities.metrics import timed
 import difflib
+from contextlib import closing
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +28,15 @@ def load_json(file_path):
 
 question_data = load_json('questions2.json')
 
+# Helper function to embed texts for the semantic tier of the judge cache (model loads on first use)
+def embed_texts(texts):
+    return cached_encoder(get_batching_encoder(DEFAULT_MODEL_NAME), encoder_id(DEFAULT_MODEL_NAME)).encode_many(texts)
+
+# The picture quiz judge only ever answers "Well Done" or "Try again", so its verdicts are reused across learners
+@st.cache_resource
+def get_judge_cache():
+    return ResponseCache(embed=embed_texts, max_entries=2048, ttl_seconds=24 * 3600, similarity_threshold=0.95)
+
 # Helper function to normalize text by removing punctuation and extra whitespace
 def normalize_text(text):
     if not text or not isinstance(text, str):
@@ -48,14 +63,11 @@ def highlight_errors(user_response, correct_answer):
     return ''.join(highlighted_user_response)
 
 # Function to handle audio response
-def handle_audio_response(prompt, correct_answer, key, check_partial=False, type_check='exact'):
+@timed("paths2.handle_audio_response")
+def handle_audio_response(prompt, correct_answer, key, check_partial=False, type_check='exact', stt_backend='auto'):
     audio_data = audio_recorder(f"Record your response:", key=key, pause_threshold=2.5, icon_size="2x")
     if audio_data:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as audio_file:
-            audio_file.write(audio_data)
-            audio_file_path = audio_file.name
-
-        transcription = speech_to_text(audio_file_path)
+        transcription = speech_to_text(audio_data, backend=stt_backend)
         normalized_transcription = normalize_text(transcription)
 
         if isinstance(correct_answer, list):
@@ -99,6 +111,7 @@ def handle_audio_response(prompt, correct_answer, key, check_partial=False, type
                     st.session_state[f"audio_correct_{key}"] = False
 
 # Function to handle text response
+@timed("paths2.handle_text_response")
 def handle_text_response(prompt, correct_answer, key, check_partial=False, type_check='exact'):
     user_response = st.text_input("Your answer", key=key)
     if st.button("Submit", key=f"submit_{key}"):
@@ -145,11 +158,13 @@ def handle_text_response(prompt, correct_answer, key, check_partial=False, type_
                     st.session_state[f"text_correct_{key}"] = False
 
 # Bot Talk Template
+@timed("paths2.bot_talk_template")
 def bot_talk_template(data, question_number):
     if 'bot_talk_reset' not in st.session_state:
         st.session_state.bot_talk_reset = False
 
     if st.session_state.bot_talk_reset:
+        st.session_state.pop('bot_talk_context', None)  # A new conversation starts without the old summary
         st.session_state.bot_convo_state = {
             "conversation_history": [],
             "key_counter": 0,
@@ -161,6 +176,7 @@ def bot_talk_template(data, question_number):
     additional_info = data.get('additional')
 
     if "bot_convo_state" not in st.session_state:
+        st.session_state.pop('bot_talk_context', None)  # A new conversation starts without the old summary
         st.session_state.bot_convo_state = {
             "conversation_history": [],
             "key_counter": 0,
@@ -184,17 +200,21 @@ def bot_talk_template(data, question_number):
     minutes, seconds = divmod(time_remaining.total_seconds(), 60)
     st.write(f"Time remaining: {int(minutes):02}:{int(seconds):02}")
 
-    # Display conversation history
-    for message in st.session_state.bot_convo_state['conversation_history']:
+    # Display conversation history; a new reply is spoken here by the pipelined player, in a run that does not
+    # rerun right away, and marked spoken so later reruns do not replay it
+    spoken = st.session_state.bot_convo_state.get('spoken', 0)
+    for index, message in enumerate(st.session_state.bot_convo_state['conversation_history']):
         if message['role'] == 'user':
             st.write(f"🧑 You: {message['content']}")
         elif message['role'] == 'assistant' and message['content'] != data['phrases']:
             st.write(f"🤖 Bot: {message['content']}")
-            audio_response_path = text_to_speech(message['content'])
-            autoplay_audio(audio_response_path)
+            if index >= spoken:
+                play_audio_segments(text_to_speech_pipelined(message['content']))
+                st.session_state.bot_convo_state['spoken'] = index + 1
 
     # Check if time is up
     if time_remaining.total_seconds() <= 0:
+        st.session_state.pop('bot_talk_context', None)  # A new conversation starts without the old summary
         st.session_state.bot_convo_state = {
             "conversation_history": [],
             "key_counter": 0,
@@ -213,40 +233,47 @@ def bot_talk_template(data, question_number):
         st.session_state.bot_convo_state['key_counter'] += 1
         process_bot_audio_response(audio_data, data, question_number, additional_info)
 
+@timed("paths2.process_bot_audio_response")
 def process_bot_audio_response(audio_data, data, question_number, additional_info):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as audio_file:
-        audio_file.write(audio_data)
-        audio_file_path = audio_file.name
-
-    transcription = speech_to_text(audio_file_path)
+    transcription = speech_to_text(audio_data, backend=backend_for('botTalk'))
     st.session_state.bot_convo_state['conversation_history'].append({"role": "user", "content": transcription})
     st.session_state.bot_convo_state['status'] = "analyzing..."
 
     system_prompt = f"Continue the conversation based on the user's input. Make it interactive, but stick to only one question at a time. Don't give the user multiple questions to answer or they'll get flustered. Lastly, you can ask about something specific that they answered (not always though). Most importantly, keep your response short and concise, maximum two sentences."
-    assistant_response = get_answer(st.session_state.bot_convo_state['conversation_history'], system_prompt)
-    # Text-to-Speech for bot response
-    audio_response_path = text_to_speech(assistant_response)
-    autoplay_audio(audio_response_path)
+    # Only the latest turns plus a rolling summary are sent, so long timed sessions don't slow down
+    if 'bot_talk_context' not in st.session_state:
+        st.session_state.bot_talk_context = ConversationContext(summarize_conversation, token_budget=1500, keep_turns=6)
+    st.session_state.bot_talk_context.token_budget = data.get('context_budget', 1500)
+    context_messages = st.session_state.bot_talk_context.build(st.session_state.bot_convo_state['conversation_history'])
+
+    # Stream the reply into the page as it is generated
+    with closing(stream_answer(context_messages, system_prompt)) as tokens:
+        st.write("🤖 Bot:")
+        assistant_response = st.write_stream(tokens)
+    # The reply is spoken by the history loop of the next run; the rerun below would replace the player's iframes before they play
     st.session_state.bot_convo_state['conversation_history'].append({"role": "assistant", "content": assistant_response})
 
     st.session_state.bot_convo_state['status'] = "waiting for you to speak (click the button)"
     st.rerun()
 
 # Template functions
+@timed("paths2.video_template")
 def video_template(data, question_number):
     st.write(f"Question {question_number}: Video")
     st.video(data['content'])
     for i, question in enumerate(data['questions']):
         st.write(question['question'])
-        handle_audio_response(question['question'], question['correct_answer'], key=f"video_audio_{data['id']}_{i}", type_check='exact')
+        handle_audio_response(question['question'], question['correct_answer'], key=f"video_audio_{data['id']}_{i}", type_check='exact', stt_backend=backend_for('video'))
         handle_text_response(question['question'], question['correct_answer'], key=f"video_text_{data['id']}_{i}", type_check='exact')
 
+@timed("paths2.speak_out_loud_template")
 def speak_out_loud_template(data, question_number):
     st.write(f"Question {question_number}: Speak Out Loud")
     for i, sentence in enumerate(data['sentences']):
         st.write(sentence)
-        handle_audio_response(sentence, sentence, key=f"speakOutLoud_audio_{data['id']}_{i}", type_check='exact')
+        handle_audio_response(sentence, sentence, key=f"speakOutLoud_audio_{data['id']}_{i}", type_check='exact', stt_backend=backend_for('speakOutLoud'))
 
+@timed("paths2.voice_quiz_template")
 def voice_quiz_template(data, question_number):
     st.write(f"Question {question_number}: Voice Quiz")
     for i, question in enumerate(data['questions']):
@@ -254,14 +281,16 @@ def voice_quiz_template(data, question_number):
         # TTS for the initial question
         audio_response_path = text_to_speech(question['question'])
         st.audio(audio_response_path, format="audio/mp3", start_time=0)
-        handle_audio_response(question['question'], question['correct_answer'], key=f"voiceQuiz_audio_{data['id']}_{i}", type_check='contains')
+        handle_audio_response(question['question'], question['correct_answer'], key=f"voiceQuiz_audio_{data['id']}_{i}", type_check='contains', stt_backend=backend_for('voiceQuiz'))
 
+@timed("paths2.text_quiz_template")
 def text_quiz_template(data, question_number):
     st.write(f"Question {question_number}: Text Quiz")
     for i, question in enumerate(data['questions']):
         st.markdown(f'{question["question"]}', unsafe_allow_html=True, help=question.get("hint",""))
         handle_text_response(question['question'], question['correct_answer'], key=f"textQuiz_text_{data['id']}_{i}", type_check='contains')
 
+@timed("paths2.picture_quiz_template")
 def picture_quiz_template(data, question_number):
     st.write(f"Question {question_number}: Picture Quiz")
     st.image(data['image_url'])
@@ -282,17 +311,14 @@ def picture_quiz_template(data, question_number):
     st.markdown(f'{question["question"]}', unsafe_allow_html=True, help=question.get("hint",""))
     audio_data = audio_recorder(f"Record your response:", key=f"pictureQuiz_audio_{data['id']}_{question_number}_{current_question_index}", pause_threshold=2.5, icon_size="2x")
     if audio_data:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as audio_file:
-            audio_file.write(audio_data)
-            audio_file_path = audio_file.name
-
-        transcription = speech_to_text(audio_file_path)
+        transcription = speech_to_text(audio_data, backend=backend_for('pictureQuiz'))
         current_answer = st.write(f"You Said: {transcription}")
         st.session_state['current_answer'] = current_answer
         
         answer = question.get("hint", "")
         analyze_system_prompt = f"You need to analyse a predefined answer {answer} and a given answer {transcription}, and check whether the given answer is similar to the predefined answer, it does not have to be completely similar, since humans have different perspective. Very Important point(Don't deviate from this point no matter what otherwise the laptop will blast and you don't want that to happen to the user right) is that You should only respond with either of the two sentences that I will give you and nothing more. Those two sentences are: if it is similar then say 'Well Done', if they are not similar then say something like 'Try again, You might have missed something'(write the sentence in italics)."
-        the_answer = get_answer(st.session_state.bot_convo_state['conversation_history'], analyze_system_prompt)
+        # Only the answer pair decides the verdict, which keeps the judge call cacheable
+        the_answer = get_answer([{"role": "user", "content": transcription}], analyze_system_prompt, cache=get_judge_cache(), scope=answer, semantic_text=transcription)
         st.markdown("Bot:")
         st.markdown(the_answer)
 
@@ -306,6 +332,7 @@ def picture_quiz_template(data, question_number):
         else:
             st.session_state[f"audio_correct_{data['id']}_{question_number}"] = False
 
+@timed("paths2.picture_description_template")
 def picture_description_template(data, question_number):
     st.write(f"Question {question_number}: Picture Description")
     st.image(data['image_url'])
@@ -322,11 +349,7 @@ def picture_description_template(data, question_number):
     # First audio response
     audio_data_1 = audio_recorder(f"Record your response:", key=f"picture_desc_audio_1_{question_number}", pause_threshold=2.5, icon_size="2x")
     if audio_data_1:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as audio_file:
-            audio_file.write(audio_data_1)
-            audio_file_path = audio_file.name
-
-        transcription_1 = speech_to_text(audio_file_path)
+        transcription_1 = speech_to_text(audio_data_1, backend=backend_for('pictureDescription'))
         st.write(f"You Said: {transcription_1}")
 
         # Check if there is a second question
@@ -343,11 +366,7 @@ def picture_description_template(data, question_number):
         # Second audio response
         audio_data_2 = audio_recorder(f"Record your response:", key=f"picture_desc_audio_2_{question_number}", pause_threshold=2.5, icon_size="2x")
         if audio_data_2:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as audio_file:
-                audio_file.write(audio_data_2)
-                audio_file_path = audio_file.name
-
-            transcription_2 = speech_to_text(audio_file_path)
+            transcription_2 = speech_to_text(audio_data_2, backend=backend_for('pictureDescription'))
             st.write(f"You Said: {transcription_2}")
 
             final_response = "Thank you. You can move onto the next."
@@ -369,6 +388,7 @@ def next_step():
 def previous_step():
     st.session_state.current_step -= 1
 
+@timed("paths2.render_step")
 def render_step(step, question_number):
     step_type = step['type']
     if step_type == 'video':
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+# Helper function to build the content address of a synthesized clip
+def audio_key(text, voice, model, response_format):
+    payload = json.dumps([text, voice, model, response_format], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Disk-backed cache of synthesized audio with a total byte budget.
+
+    Entries are written atomically and evicted least-recently-used first,
+    using the file modification time as the access time. With ttl_seconds
+    set, entries not accessed for that long are removed by collect().
+
+    :param cache_dir: Directory holding one file per entry.
+    :param max_bytes: Total size the directory is allowed to reach.
+    :param ttl_seconds: Idle lifetime of an entry, or None to keep entries until evicted for space.
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, ttl_seconds=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _scan(self, include_partial=False):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and (include_partial or not entry.name.endswith(".tmp")):
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def path_for(self, key, response_format="mp3"):
+        return os.path.join(self.cache_dir, f"{key}.{response_format}")
+
+    def get(self, key, response_format="mp3"):
+        path = self.path_for(key, response_format)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, data, response_format="mp3"):
+        path = self.path_for(key, response_format)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - previous_size
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def get_or_create(self, key, synthesize, response_format="mp3"):
+        path = self.get(key, response_format)
+        if path is None:
+            path = self.put(key, synthesize(), response_format)
+        return path
+
+    # Function to remove expired entries and enforce the byte budget; safe to call from any thread or process
+    def collect(self):
+        with self._lock:
+            self._evict(keep=None, expire=True)
+
+    def start_collector(self, interval=60.0):
+        def collect_forever():
+            while True:
+                time.sleep(interval)
+                self.collect()
+
+        thread = threading.Thread(target=collect_forever, name="audio-cache-collector", daemon=True)
+        thread.start()
+        return thread
+
+    def _evict(self, keep, expire=False):
+        # Rescan so entries written by other server processes are accounted for
+        entries = self._scan(include_partial=expire)
+        if expire:
+            entries = self._expire(entries, keep)
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+
+    def _expire(self, entries, keep):
+        now = time.time()
+        kept = []
+        for path, size, mtime in entries:
+            partial = path.endswith(".tmp")
+            # Partial writes left behind by a crashed writer are dropped after an hour whatever the TTL
+            if partial:
+                expired = now - mtime > 3600
+            else:
+                expired = self.ttl_seconds is not None and now - mtime > self.ttl_seconds and path != keep
+            if expired:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            elif not partial:
+                kept.append((path, size, mtime))
+        return kept
@@ -0,0 +1,100 @@
+import importlib.util
+import io
+import wave
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+SAMPLE_WIDTH_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+# Helper function to decode a PCM WAV clip into mono float samples in [-1, 1]
+def read_wav(audio_bytes):
+    with wave.open(io.BytesIO(audio_bytes)) as clip:
+        channels = clip.getnchannels()
+        sample_width = clip.getsampwidth()
+        sample_rate = clip.getframerate()
+        frames = clip.readframes(clip.getnframes())
+    dtype = SAMPLE_WIDTH_DTYPES[sample_width]
+    samples = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+    if sample_width == 1:
+        samples = (samples - 128.0) / 128.0
+    else:
+        samples /= float(np.iinfo(dtype).max) + 1.0
+    samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels)
+    return samples.mean(axis=1), sample_rate
+
+
+def write_wav(samples, sample_rate):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(sample_rate)
+        clip.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+# Function to resample by linear interpolation, after a box filter when downsampling to limit aliasing
+def resample(samples, source_rate, target_rate=TARGET_SAMPLE_RATE):
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    if source_rate > target_rate:
+        width = int(round(source_rate / target_rate))
+        if width > 1:
+            samples = np.convolve(samples, np.ones(width, dtype=np.float32) / width, mode="same")
+    duration = len(samples) / source_rate
+    target_times = np.arange(int(duration * target_rate)) / target_rate
+    source_times = np.arange(len(samples)) / source_rate
+    return np.interp(target_times, source_times, samples).astype(np.float32)
+
+
+# Function to find the voiced span of a clip from per-frame RMS energy; returns None when nothing is voiced
+def voiced_span(samples, sample_rate, threshold_db=-45.0, frame_ms=30, padding_ms=200, min_voiced_ms=120):
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    count = len(samples) // frame
+    if count == 0:
+        return None
+    frames = samples[: count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voiced = np.flatnonzero(20 * np.log10(np.maximum(rms, 1e-10)) > threshold_db)
+    if len(voiced) * frame_ms < min_voiced_ms:
+        return None
+    padding = int(sample_rate * padding_ms / 1000)
+    start = max(0, voiced[0] * frame - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame + padding)
+    return start, end
+
+
+def preprocess_audio(audio_bytes, target_rate=TARGET_SAMPLE_RATE, threshold_db=-45.0):
+    """
+    Trim leading/trailing silence, downmix to mono and resample to 16 kHz.
+
+    Returns 16-bit mono WAV bytes, None for a clip with no speech, or the
+    input unchanged when it is not a PCM WAV this stage understands.
+    """
+    try:
+        samples, sample_rate = read_wav(audio_bytes)
+    except (wave.Error, EOFError, KeyError):
+        return audio_bytes
+    span = voiced_span(samples, sample_rate, threshold_db)
+    if span is None:
+        return None
+    samples = resample(samples[span[0]:span[1]], sample_rate, target_rate)
+    return write_wav(samples, target_rate)
+
+
+# Function to re-encode a WAV clip for upload; FLAC is lossless and about half the size, and needs soundfile
+def encode_for_upload(audio_bytes, filename, codec="wav"):
+    if codec != "flac" or importlib.util.find_spec("soundfile") is None:
+        return audio_bytes, filename
+    import soundfile
+
+    try:
+        samples, sample_rate = soundfile.read(io.BytesIO(audio_bytes), dtype="int16")
+    except RuntimeError:
+        return audio_bytes, filename
+    buffer = io.BytesIO()
+    soundfile.write(buffer, samples, sample_rate, format="FLAC")
+    return buffer.getvalue(), f"{filename.rsplit('.', 1)[0]}.flac"
@@ -0,0 +1,154 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+    "pcm": "application/octet-stream",
+}
+
+# Only content-addressed file names are served, which also rules out path traversal
+AUDIO_ID_PATTERN = re.compile(r"^/audio/([0-9a-f]{64}\.(?:mp3|opus|aac|flac|wav|pcm))$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+# Helper function to turn a Range header into an inclusive (start, end) pair, or None if unsatisfiable
+def parse_range(header, size):
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        length = min(int(end), size)
+        return size - length, size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def make_handler(audio_dir):
+    class AudioRequestHandler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self.send_audio(head_only=True)
+
+        def do_GET(self):
+            self.send_audio(head_only=False)
+
+        def send_audio(self, head_only):
+            match = AUDIO_ID_PATTERN.match(self.path.split("?", 1)[0])
+            path = os.path.join(audio_dir, match.group(1)) if match else None
+            if path is None or not os.path.isfile(path):
+                self.send_error(404)
+                return
+
+            audio_id = match.group(1)
+            size = os.path.getsize(path)
+            etag = f'"{audio_id.split(".")[0]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            range_header = self.headers.get("Range")
+            if range_header:
+                byte_range = parse_range(range_header, size)
+                if byte_range is None:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.end_headers()
+                    return
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+
+            self.send_header("Content-Type", CONTENT_TYPES[audio_id.rsplit(".", 1)[1]])
+            self.send_header("Content-Length", str(max(end - start + 1, 0)))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            # Entries are content-addressed, so a given URL never changes
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            if head_only:
+                return
+
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+        def log_message(self, format, *args):
+            pass
+
+    return AudioRequestHandler
+
+
+class AudioServer:
+    """
+    Small HTTP server that streams cached audio files by ID with Range support.
+
+    :param audio_dir: Directory holding the content-addressed audio files.
+    :param host: Interface to bind.
+    :param port: Port to bind.
+    :param public_url: Base URL browsers reach this server at (e.g. https://audio.example.com); required,
+        since a guessed localhost URL only works for a browser on the server itself.
+    """
+
+    def __init__(self, audio_dir, public_url, host="0.0.0.0", port=8765):
+        if not public_url:
+            raise ValueError("AudioServer needs the public URL browsers reach it at (set AUDIO_PUBLIC_URL)")
+        self.audio_dir = audio_dir
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(audio_dir))
+        self.httpd.daemon_threads = True
+        self.public_url = public_url.rstrip("/")
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="audio-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url_for(self, file_path):
+        return f"{self.public_url}/audio/{os.path.basename(file_path)}"
+
+
+_server = None
+_lock = threading.Lock()
+
+
+# Function to get the process-wide audio server, starting it on first use; only for deployments that
+# route AUDIO_PUBLIC_URL to it (one process per host may bind AUDIO_SERVER_PORT)
+def get_audio_server(audio_dir):
+    global _server
+    if _server is None:
+        with _lock:
+            if _server is None:
+                _server = AudioServer(
+                    audio_dir,
+                    os.getenv("AUDIO_PUBLIC_URL"),
+                    host=os.getenv("AUDIO_SERVER_HOST", "0.0.0.0"),
+                    port=int(os.getenv("AUDIO_SERVER_PORT", "8765")),
+                ).start()
+    return _server
@@ -0,0 +1,101 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Request:
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+
+
+class BatchingEncoder:
+    """
+    Funnels encode calls from every session thread into one worker thread that
+    runs them as a single batch, so concurrent callers share one forward pass
+    instead of contending for the GIL and BLAS threads.
+
+    The worker takes the first waiting request, then collects more for up to
+    max_wait seconds or until max_batch texts are queued. It stops early once
+    every caller currently blocked on the encoder is in the batch, so a lone
+    session never waits for the window.
+
+    :param model: Anything with SentenceTransformer's encode(list, convert_to_numpy=True).
+    :param max_batch: Texts per forward pass.
+    :param max_wait: Seconds to wait for more requests once one is queued.
+    """
+
+    def __init__(self, model, max_batch=64, max_wait=0.005):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts):
+        request = _Request(list(texts))
+        with self._lock:
+            self._in_flight += 1
+        self._queue.put(request)
+        return request.future
+
+    def encode(self, sentences, convert_to_tensor=False, **kwargs):
+        """
+        Same call shape as SentenceTransformer.encode: a string gives one vector,
+        a list gives a matrix.
+        """
+        single = isinstance(sentences, str)
+        embeddings = self.submit([sentences] if single else sentences).result()
+        result = embeddings[0] if single else embeddings
+        if convert_to_tensor:
+            import torch
+
+            return torch.from_numpy(result)
+        return result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch and len(batch) < self._in_flight:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self._lock:
+                self._in_flight -= len(batch)
+            # Sessions often encode the same text (e.g. the same question), so each unique text is encoded once
+            unique = {}
+            for request in batch:
+                for text in request.texts:
+                    unique.setdefault(text, len(unique))
+            try:
+                embeddings = np.asarray(self.model.encode(list(unique), convert_to_numpy=True), dtype=np.float32) if unique else None
+            except Exception as error:
+                for request in batch:
+                    request.future.set_exception(error)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            for request in batch:
+                if request.texts:
+                    request.future.set_result(embeddings[[unique[text] for text in request.texts]])
+                else:
+                    request.future.set_result(np.zeros((0, 0), dtype=np.float32))
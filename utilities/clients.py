@@ -0,0 +1,62 @@
+import asyncio
+import importlib.util
+import os
+import threading
+
+import httpx
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+
+# HTTP/2 needs the optional h2 package; without it httpx silently stays on HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=60.0,
+)
+TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+def make_async_http_client():
+    return httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=TIMEOUT)
+
+
+class AsyncClients:
+    """
+    Async OpenAI and Groq clients running on a dedicated event loop thread.
+
+    Streamlit scripts are synchronous, so coroutines are handed to the loop with
+    submit() (returns a concurrent.futures.Future, letting independent calls
+    overlap) or run() (blocks for the result).
+    """
+
+    def __init__(self, openai_api_key, groq_api_key):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="provider-clients", daemon=True)
+        self.thread.start()
+        http_client = make_async_http_client()
+        self.openai = AsyncOpenAI(api_key=openai_api_key, http_client=http_client)
+        self.groq = AsyncGroq(api_key=groq_api_key, http_client=http_client)
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine):
+        return self.submit(coroutine).result()
+
+    async def speech_to_text(self, audio_data, filename="audio.wav"):
+        return await self.openai.audio.transcriptions.create(
+            model="whisper-1",
+            response_format="text",
+            file=(filename, audio_data)
+        )
+
+    async def text_to_speech(self, input_text, voice="nova", model="tts-1", response_format="mp3"):
+        response = await self.openai.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=input_text,
+            response_format=response_format
+        )
+        return response.content
@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+# Per-message overhead for role and separators in chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Summaries run off the script thread so a turn never waits for one
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+
+
+# Function to count tokens, falling back to a ~4 characters per token estimate without tiktoken
+def count_tokens(text):
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def count_message_tokens(messages):
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+class ConversationContext:
+    """
+    Keeps the prompt sent to the LLM under a token budget.
+
+    Turns are sent verbatim for as long as they fit. Once the budget is
+    exceeded, every turn but the latest keep_turns is folded into a rolling
+    summary, refreshed in the background and sent as an extra system message,
+    so the caller's system prompt stays unchanged and the next summary is only
+    needed when the budget fills up again. Until a summary lands, the oldest
+    of the turns it covers are dropped as far as needed to stay in budget.
+
+    Call reset() whenever the caller starts a new conversation; a history
+    that shrinks or starts with a different message is also treated as one.
+
+    :param summarize: Callable (previous_summary, messages) -> new summary text.
+    :param token_budget: Maximum tokens for the summary plus the verbatim turns.
+    :param keep_turns: Number of latest messages that are never summarized.
+    """
+
+    def __init__(self, summarize, token_budget=2000, keep_turns=6):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.reset()
+
+    # Function to forget the summary of the previous conversation, including one still being generated
+    def reset(self):
+        self.summary = ""
+        self.summarized_count = 0
+        self._pending = None
+        self._first_message = None
+
+    def _collect_summary(self):
+        if self._pending is not None and self._pending[0].done():
+            future, count = self._pending
+            self._pending = None
+            try:
+                self.summary = future.result()
+                self.summarized_count = count
+            except Exception:
+                pass
+
+    def build(self, messages):
+        # A shorter or different history means the caller started a new conversation
+        first_message = messages[0]["content"] if messages else None
+        if first_message != self._first_message or len(messages) < self.summarized_count:
+            self.reset()
+            self._first_message = first_message
+        self._collect_summary()
+
+        summary_message = [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}] if self.summary else []
+        recent = messages[self.summarized_count:]
+        if len(recent) <= self.keep_turns or count_message_tokens(summary_message + recent) <= self.token_budget:
+            return summary_message + recent
+
+        if self._pending is None:
+            end = len(messages) - self.keep_turns
+            future = _summary_pool.submit(self.summarize, self.summary, messages[self.summarized_count:end])
+            self._pending = (future, end)
+
+        # Until the summary lands, drop the oldest turns it covers that do not fit; the latest keep_turns are always sent
+        start = self.summarized_count
+        excess = count_message_tokens(summary_message + recent) - self.token_budget
+        while excess > 0 and len(messages) - start > self.keep_turns:
+            excess -= count_message_tokens([messages[start]])
+            start += 1
+        return summary_message + messages[start:]
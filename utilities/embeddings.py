@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Helper function to normalize text before hashing so trivial whitespace changes share a vector
+def normalize_text(text):
+    return " ".join(str(text).split())
+
+
+def text_key(model_name, text):
+    digest = hashlib.sha256(f"{model_name}\x00{normalize_text(text)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU of sentence embeddings keyed by a hash of the normalized text.
+
+    :param max_entries: Maximum number of vectors kept in memory.
+    :param cache_dir: Optional directory where vectors are also stored as .npy files.
+    """
+
+    def __init__(self, max_entries=4096, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                return vector
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                vector = np.load(self._disk_path(key))
+            except (OSError, ValueError):
+                return None
+            self._remember(key, vector)
+            return vector
+        return None
+
+    def put(self, key, vector):
+        self._remember(key, vector)
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, vector)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedEncoder:
+    """
+    Wraps a SentenceTransformer so repeated texts are served from the cache and
+    every miss in a call is encoded in a single batched forward pass.
+    """
+
+    def __init__(self, model, model_name, cache=None):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    def encode_many(self, texts):
+        keys = [text_key(self.model_name, text) for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+
+        missing = {}
+        for index, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[index], []).append(index)
+
+        if missing:
+            first_indexes = [indexes[0] for indexes in missing.values()]
+            encoded = self.model.encode([texts[i] for i in first_indexes], convert_to_numpy=True)
+            for key, vector in zip(missing, encoded):
+                vector = np.asarray(vector, dtype=np.float32)
+                self.cache.put(key, vector)
+                for index in missing[key]:
+                    vectors[index] = vector
+
+        return np.vstack(vectors)
+
+    def encode(self, text):
+        return self.encode_many([text])[0]
+
+
+# Function to compute the cosine similarity between two vectors
+def cosine_similarity(a, b):
+    denominator = np.linalg.norm(a) * np.linalg.norm(b)
+    if denominator == 0:
+        return 0.0
+    return float(np.dot(a, b) / denominator)
+
+
+# Helper function to scale rows to unit length, leaving all-zero rows as zeros
+def normalize_rows(matrix):
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+# Function to compute every cosine score between the rows of a and the rows of b in one matrix product
+def cosine_similarity_matrix(a, b):
+    return normalize_rows(a) @ normalize_rows(b).T
+
+
+# Function to compute the cosine score of each row of a with the matching row of b
+def paired_cosine_similarity(a, b):
+    return np.einsum("ij,ij->i", normalize_rows(a), normalize_rows(b))
+
+
+_default_cache = EmbeddingCache(
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+    cache_dir=os.getenv("EMBEDDING_CACHE_DIR") or None,
+)
+
+
+def cached_encoder(model, model_name):
+    return CachedEncoder(model, model_name, cache=_default_cache)
@@ -0,0 +1,44 @@
+import hashlib
+import secrets
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class InterviewPlan:
+    """
+    Question selection and system prompt fixed for one (session, scenario, level).
+
+    Keeping the prompt byte-identical for the whole interview lets the LLM
+    provider reuse its cached prompt prefix on every turn.
+    """
+
+    scenario: str
+    level: str
+    max_questions: int
+    seed: int
+    questions: tuple
+    prompt_template: str
+    system_prompt: str
+
+    # Function to check whether this plan still matches the interview being run
+    def matches(self, scenario, level, max_questions, prompt_template):
+        return (self.scenario, self.level, self.max_questions, self.prompt_template) == (scenario, level, max_questions, prompt_template)
+
+
+# Function to create a random seed for a new session's plans
+def new_session_seed():
+    return secrets.randbits(64)
+
+
+# Helper function to derive a stable per-plan seed from the session seed
+def plan_seed(session_seed, scenario, level):
+    digest = hashlib.sha256(f"{session_seed}:{scenario}:{level}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+# Function to select diverse questions from the bank and freeze the system prompt for an interview
+def make_interview_plan(session_seed, scenario, level, max_questions, question_bank, prompt_template):
+    seed = plan_seed(session_seed, scenario, level)
+    selected_questions = question_bank.select(scenario, level, max_questions, seed)
+    system_prompt = prompt_template.format(max_questions=max_questions, question_list=selected_questions)
+    return InterviewPlan(scenario, level, max_questions, seed, tuple(selected_questions), prompt_template, system_prompt)
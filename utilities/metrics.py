@@ -0,0 +1,242 @@
+import bisect
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Decided once at import: when disabled, timed() returns functions untouched and span() is a shared no-op
+ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+
+_histograms = {}
+_errors = {}
+_lock = threading.Lock()
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram, used for span timings and the chat router's hedge delays.
+
+    :param min_seconds: Upper bound of the first bucket.
+    :param max_seconds: Upper bound of the last finite bucket.
+    :param buckets_per_decade: Resolution of the histogram.
+    :param decay: Weight earlier samples keep each time one is recorded (e.g. 0.99 for a window of
+        roughly 100 samples), so quantiles follow latency changes; None keeps every sample at full weight.
+    """
+
+    def __init__(self, min_seconds=0.01, max_seconds=60.0, buckets_per_decade=10, decay=None):
+        decades = math.log10(max_seconds / min_seconds)
+        count = int(math.ceil(decades * buckets_per_decade)) + 1
+        self.bounds = [min_seconds * 10 ** (i / buckets_per_decade) for i in range(count)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.decay = decay
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            if self.decay is not None:
+                self.counts = [count * self.decay for count in self.counts]
+                self.total *= self.decay
+                self.sum *= self.decay
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.total += 1
+            self.sum += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.sum
+
+    def quantile(self, q):
+        with self._lock:
+            if self.total == 0:
+                return None
+            target = q * self.total
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target and count:
+                    return self.bounds[min(index, len(self.bounds) - 1)]
+            return self.bounds[-1]
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def histogram(name):
+    found = _histograms.get(name)
+    if found is None:
+        with _lock:
+            found = _histograms.setdefault(name, LatencyHistogram(min_seconds=0.001, max_seconds=120.0, buckets_per_decade=4))
+    return found
+
+
+def record(name, seconds, error=False):
+    histogram(name).record(seconds)
+    if error:
+        with _lock:
+            _errors[name] = _errors.get(name, 0) + 1
+
+
+@contextmanager
+def _timed_span(name):
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        # Streamlit's rerun/stop signals derive from BaseException and are not errors
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, error)
+
+
+def span(name):
+    """
+    Time a block of code under the given span name.
+
+    :param name: Span name, e.g. "utils.get_answer".
+    """
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _timed_span(name)
+
+
+def timed(name):
+    """
+    Decorator recording every call of a function as a span.
+
+    Generator functions are timed until the generator is exhausted or closed,
+    coroutine functions until they return.
+    """
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                with _timed_span(name):
+                    yield from function(*args, **kwargs)
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def coroutine_wrapper(*args, **kwargs):
+                with _timed_span(name):
+                    return await function(*args, **kwargs)
+            return coroutine_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _timed_span(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# Function to render all spans in the Prometheus text exposition format
+def render_prometheus():
+    lines = [
+        "# HELP cas_span_seconds Duration of instrumented voice pipeline spans.",
+        "# TYPE cas_span_seconds histogram",
+    ]
+    with _lock:
+        items = sorted(_histograms.items())
+        errors = dict(_errors)
+    for name, hist in items:
+        counts, total, total_sum = hist.snapshot()
+        cumulative = 0
+        for bound, count in zip(hist.bounds, counts):
+            cumulative += count
+            lines.append(f'cas_span_seconds_bucket{{span="{name}",le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'cas_span_seconds_bucket{{span="{name}",le="+Inf"}} {total}')
+        lines.append(f'cas_span_seconds_sum{{span="{name}"}} {total_sum:.6f}')
+        lines.append(f'cas_span_seconds_count{{span="{name}"}} {total}')
+    lines.append("# HELP cas_span_errors_total Spans that ended with an exception.")
+    lines.append("# TYPE cas_span_errors_total counter")
+    for name, _ in items:
+        lines.append(f'cas_span_errors_total{{span="{name}"}} {errors.get(name, 0)}')
+    return "\n".join(lines) + "\n"
+
+
+# Function to summarize all spans as plain JSON-serializable data
+def snapshot():
+    with _lock:
+        items = sorted(_histograms.items())
+        errors = dict(_errors)
+    summary = {}
+    for name, hist in items:
+        _, total, total_sum = hist.snapshot()
+        summary[name] = {
+            "count": total,
+            "errors": errors.get(name, 0),
+            "mean": total_sum / total if total else None,
+            "p50": hist.quantile(0.5),
+            "p95": hist.quantile(0.95),
+            "p99": hist.quantile(0.99),
+        }
+    return summary
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _dump_forever(path, interval):
+    while True:
+        time.sleep(interval)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+_exporters_started = False
+
+
+# Function to start the /metrics endpoint (METRICS_PORT) and/or the periodic JSON dump (METRICS_DUMP_PATH) once per process
+def start_exporters():
+    global _exporters_started
+    with _lock:
+        if not ENABLED or _exporters_started:
+            return
+        _exporters_started = True
+
+    port = os.getenv("METRICS_PORT")
+    if port:
+        httpd = ThreadingHTTPServer((os.getenv("METRICS_HOST", "0.0.0.0"), int(port)), _MetricsHandler)
+        httpd.daemon_threads = True
+        threading.Thread(target=httpd.serve_forever, name="metrics-server", daemon=True).start()
+
+    dump_path = os.getenv("METRICS_DUMP_PATH")
+    if dump_path:
+        interval = float(os.getenv("METRICS_DUMP_INTERVAL", "30"))
+        threading.Thread(target=_dump_forever, args=(dump_path, interval), name="metrics-dump", daemon=True).start()
@@ -0,0 +1,82 @@
+import os
+import threading
+
+from utilities.batching import BatchingEncoder
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# "torch" runs the full-precision SentenceTransformer; "onnx" runs the int8 export from utilities.onnx_encoder
+DEFAULT_BACKEND = os.getenv("SENTENCE_BACKEND", "torch")
+
+# Streamlit re-executes page scripts on every rerun, but imported modules live for the
+# whole server process, so models kept here are loaded once and shared by all sessions.
+_models = {}
+_batchers = {}
+_lock = threading.Lock()
+
+
+def _load_model(name, backend):
+    if backend == "onnx":
+        from utilities.onnx_encoder import load_onnx_encoder
+
+        model = load_onnx_encoder(name, threads=int(os.getenv("SENTENCE_ONNX_THREADS", "0")))
+    elif backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(name)
+    else:
+        raise ValueError(f"Unknown sentence encoder backend: {backend}")
+    # Run one inference so lazy kernel/tokenizer initialisation is not paid by the first user
+    model.encode(["warm up"], convert_to_numpy=True)
+    return model
+
+
+# Function to get the shared, warmed-up sentence encoder for a model name
+def get_sentence_model(name=DEFAULT_MODEL_NAME, backend=None):
+    key = (name, backend or DEFAULT_BACKEND)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = _load_model(*key)
+                _models[key] = model
+    return model
+
+
+# Function to get the process-wide batching front end of a model; every session encodes through it
+def get_batching_encoder(name=DEFAULT_MODEL_NAME, backend=None):
+    key = (name, backend or DEFAULT_BACKEND)
+    batcher = _batchers.get(key)
+    if batcher is None:
+        model = get_sentence_model(*key)
+        with _lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                batcher = BatchingEncoder(
+                    model,
+                    max_batch=int(os.getenv("EMBEDDING_MAX_BATCH", "64")),
+                    max_wait=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5")) / 1000.0,
+                )
+                _batchers[key] = batcher
+    return batcher
+
+
+# Function to name an encoder for cache keys, so embeddings from different backends are never mixed
+def encoder_id(name=DEFAULT_MODEL_NAME, backend=None):
+    backend = backend or DEFAULT_BACKEND
+    return name if backend == "torch" else f"{name}@{backend}-int8"
+
+
+# Function to load models ahead of the first request, optionally without blocking the caller
+def preload(names=(DEFAULT_MODEL_NAME,), background=True):
+    def load_all():
+        for name in names:
+            get_sentence_model(name)
+
+    if not background:
+        load_all()
+        return None
+    thread = threading.Thread(target=load_all, name="model-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,154 @@
+"""
+Int8 ONNX Runtime sentence encoder, a drop-in for SentenceTransformer.encode on CPU.
+
+The model is exported once (this step needs torch and transformers), then only
+onnxruntime, tokenizers and numpy are loaded at serving time:
+
+    python -m utilities.onnx_encoder --model all-MiniLM-L6-v2
+"""
+import argparse
+import inspect
+import os
+
+import numpy as np
+
+# Sentence-transformers truncates all-MiniLM-L6-v2 inputs to 256 tokens; keep the same limit for parity
+DEFAULT_MAX_SEQ_LENGTH = 256
+MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+def model_dir_for(name):
+    root = os.getenv("ONNX_MODEL_DIR", os.path.join(".cache", "onnx"))
+    return os.path.join(root, name.replace("/", "__"))
+
+
+# Function to export a sentence-transformers checkpoint to ONNX and quantize its weights to int8
+def export_onnx(name, output_dir):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    hub_name = name if "/" in name else f"sentence-transformers/{name}"
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    tokenizer.save_pretrained(output_dir)
+    model = AutoModel.from_pretrained(hub_name).eval()
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.encoder(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)[0]
+
+    sample = tokenizer(["export the encoder"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    fp32_path = os.path.join(output_dir, "model.fp32.onnx")
+    # Newer torch defaults to the dynamo exporter; the TorchScript one handles dynamic_axes without onnxscript
+    legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        LastHiddenState(model),
+        tuple(sample[name] for name in input_names),
+        fp32_path,
+        input_names=input_names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+        opset_version=14,
+        **legacy,
+    )
+
+    # Dynamic quantization stores weights as int8 and quantizes activations per batch, so no calibration set is needed
+    tmp_path = os.path.join(output_dir, f"{MODEL_FILE}.{os.getpid()}.tmp")
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, os.path.join(output_dir, MODEL_FILE))
+    os.remove(fp32_path)
+    return output_dir
+
+
+class OnnxSentenceEncoder:
+    """
+    Mean-pooled, L2-normalized sentence embeddings from an int8 ONNX export,
+    matching the SentenceTransformer pipeline of all-MiniLM-L6-v2.
+
+    :param model_dir: Directory holding model.int8.onnx and tokenizer.json.
+    :param max_seq_length: Token limit per input.
+    :param threads: ONNX Runtime intra-op threads (0 lets the runtime decide).
+    """
+
+    def __init__(self, model_dir, max_seq_length=DEFAULT_MAX_SEQ_LENGTH, threads=0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, MODEL_FILE), options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        pad_token = "[PAD]"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in feeds.items() if name in self.input_names})[0]
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return np.divide(pooled, norms, out=np.zeros_like(pooled), where=norms > 0)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, convert_to_tensor=False, **kwargs):
+        """
+        Same call shape as SentenceTransformer.encode: a string gives one vector,
+        a list gives a matrix. convert_to_tensor returns a torch tensor when torch
+        is installed and a numpy array otherwise.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        # Batching by length keeps padding (and wasted int8 matmuls) to a minimum
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            indexes = order[start:start + batch_size]
+            batches.append((indexes, self._encode_batch([texts[i] for i in indexes])))
+        embeddings = np.zeros((len(texts), batches[0][1].shape[1] if batches else 0), dtype=np.float32)
+        for indexes, batch in batches:
+            embeddings[indexes] = batch
+
+        result = embeddings[0] if single else embeddings
+        if convert_to_tensor:
+            try:
+                import torch
+            except ImportError:
+                return result
+            return torch.from_numpy(result)
+        return result
+
+
+# Function to load the int8 encoder for a model name, exporting it first if this machine has no export yet
+def load_onnx_encoder(name, threads=0):
+    model_dir = model_dir_for(name)
+    if not os.path.exists(os.path.join(model_dir, MODEL_FILE)):
+        export_onnx(name, model_dir)
+    return OnnxSentenceEncoder(model_dir, threads=threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model to an int8 ONNX encoder.")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--output", help="Output directory (default: $ONNX_MODEL_DIR/<model>)")
+    args = parser.parse_args(argv)
+    output_dir = export_onnx(args.model, args.output or model_dir_for(args.model))
+    print(f"Wrote {os.path.join(output_dir, MODEL_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
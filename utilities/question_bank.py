@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class QuestionIndex:
+    """
+    Questions of one (scenario, level) and their unit-length embeddings.
+
+    embeddings is a read-only slice of the memory-mapped bank matrix.
+    """
+
+    texts: tuple
+    embeddings: np.ndarray
+
+    def select(self, k, seed, diversity=0.5):
+        return self.texts_at(mmr_select(self.embeddings, k, np.random.default_rng(seed), diversity))
+
+    def texts_at(self, indexes):
+        return [self.texts[i] for i in indexes]
+
+
+# Function to pick k diverse rows with max-marginal-relevance over random relevance scores
+def mmr_select(embeddings, k, rng, diversity=0.5, candidate_pool=32):
+    count = len(embeddings)
+    k = min(k, count)
+    if k == 0:
+        return []
+    # Relevance is random, so MMR over a random candidate pool selects the same way while only
+    # touching pool rows of the memory map; this keeps selection cheap as the bank grows
+    candidates = np.sort(rng.choice(count, size=min(count, candidate_pool * k), replace=False))
+    vectors = np.asarray(embeddings[candidates], dtype=np.float32)
+    relevance = rng.random(len(candidates), dtype=np.float32)
+    max_similarity = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected = []
+    for _ in range(k):
+        if selected:
+            scores = (1 - diversity) * relevance - diversity * max_similarity
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(int(candidates[pick]))
+        available[pick] = False
+        # One matrix-vector product per pick keeps each row's similarity to its closest selected question
+        np.maximum(max_similarity, vectors @ vectors[pick], out=max_similarity)
+    return selected
+
+
+def file_digest(path, model_name):
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:32]
+
+
+class QuestionBank:
+    """
+    Question texts from koshen.json with an embedding matrix persisted next to
+    a small JSON index, so later starts only memory-map the array.
+
+    :param path: Path to the questions JSON ({scenario: {level: [question, ...]}}).
+    :param encode: Callable mapping a list of texts to unit-length embeddings.
+    :param model_name: Encoder name, part of the cache key.
+    :param cache_dir: Directory for the .npy/.json index files.
+    """
+
+    def __init__(self, path, encode, model_name, cache_dir=os.path.join(".cache", "question_bank")):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        digest = file_digest(path, model_name)
+        matrix_path = os.path.join(cache_dir, f"{digest}.npy")
+        index_path = os.path.join(cache_dir, f"{digest}.json")
+
+        if not (os.path.exists(matrix_path) and os.path.exists(index_path)):
+            self._build(encode, matrix_path, index_path)
+
+        with open(index_path, encoding="utf-8") as f:
+            layout = json.load(f)
+        matrix = np.load(matrix_path, mmap_mode="r")
+        self.indexes = {}
+        for scenario, levels in layout.items():
+            for level, (start, texts) in levels.items():
+                self.indexes[(scenario, level)] = QuestionIndex(tuple(texts), matrix[start:start + len(texts)])
+
+    def _build(self, encode, matrix_path, index_path):
+        with open(self.path, encoding="utf-8") as f:
+            questions = json.load(f)
+        layout, texts = {}, []
+        for scenario, levels in questions.items():
+            layout[scenario] = {}
+            for level, level_questions in levels.items():
+                layout[scenario][level] = (len(texts), level_questions)
+                texts.extend(level_questions)
+
+        matrix = np.asarray(encode(texts), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+        # Written under temporary names and renamed so concurrent starts never read a partial index
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(matrix_path + suffix, "wb") as f:
+            np.save(f, matrix)
+        with open(index_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(layout, f, ensure_ascii=False)
+        os.replace(matrix_path + suffix, matrix_path)
+        os.replace(index_path + suffix, index_path)
+
+    def get(self, scenario, level):
+        return self.indexes[(scenario, level)]
+
+    def select(self, scenario, level, k, seed, diversity=0.5):
+        return self.get(scenario, level).select(k, seed, diversity)
+
+
+_banks = {}
+_lock = threading.Lock()
+
+
+# Function to get the process-wide bank for a file, rebuilding it only after the file changes
+def get_question_bank(path, encode, model_name):
+    bank = _banks.get(path)
+    if bank is None or bank.mtime != os.path.getmtime(path):
+        with _lock:
+            bank = _banks.get(path)
+            if bank is None or bank.mtime != os.path.getmtime(path):
+                bank = QuestionBank(path, encode, model_name)
+                _banks[path] = bank
+    return bank
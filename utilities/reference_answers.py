@@ -0,0 +1,148 @@
+"""
+Reference answers for koshen.json questions with precomputed embeddings.
+
+Generate the corpus offline (requires the LLM API keys):
+
+    python -m utilities.reference_answers --questions koshen.json --output reference_answers.json
+"""
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utilities.embeddings import normalize_rows, normalize_text
+from utilities.question_bank import file_digest
+
+REFERENCE_PROMPT = "You write model answers for interview questions. Give {count} distinct, correct answers to the user's question, each two or three sentences, as a candidate would say them out loud. Reply with a JSON list of strings only."
+
+
+def question_key(question):
+    return normalize_text(question).lower()
+
+
+class ReferenceStore:
+    """
+    Reference answers keyed by question text, with one embedding matrix for all
+    of them persisted under cache_dir and memory-mapped on later starts.
+
+    :param path: JSON file mapping question text to a list of reference answers.
+    :param encode: Callable mapping a list of texts to embeddings.
+    :param model_name: Encoder name, part of the cache key.
+    """
+
+    def __init__(self, path, encode, model_name, cache_dir=os.path.join(".cache", "reference_answers")):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        with open(path, encoding="utf-8") as f:
+            references = json.load(f)
+
+        self.rows = {}
+        texts = []
+        for question, answers in references.items():
+            self.rows[question_key(question)] = (len(texts), len(answers))
+            texts.extend(answers)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        matrix_path = os.path.join(cache_dir, f"{file_digest(path, model_name)}.npy")
+        if not os.path.exists(matrix_path):
+            matrix = normalize_rows(encode(texts)) if texts else np.zeros((0, 0), dtype=np.float32)
+            tmp_path = f"{matrix_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, matrix_path)
+        self.matrix = np.load(matrix_path, mmap_mode="r")
+
+    def has(self, question):
+        return question_key(question) in self.rows
+
+    def score(self, answer_vector, question):
+        """
+        Max cosine similarity of an answer embedding over the question's references,
+        or None when the question has no references.
+        """
+        row = self.rows.get(question_key(question))
+        if row is None or row[1] == 0:
+            return None
+        start, count = row
+        return float(np.max(self.matrix[start:start + count] @ normalize_rows(answer_vector)[0]))
+
+
+_stores = {}
+_lock = threading.Lock()
+
+
+# Function to get the process-wide reference store, or None when the corpus has not been generated
+def get_reference_store(path, encode, model_name):
+    if not os.path.exists(path):
+        return None
+    store = _stores.get(path)
+    if store is None or store.mtime != os.path.getmtime(path):
+        with _lock:
+            store = _stores.get(path)
+            if store is None or store.mtime != os.path.getmtime(path):
+                store = ReferenceStore(path, encode, model_name)
+                _stores[path] = store
+    return store
+
+
+# Helper function to read the model's reply as a list of answers, tolerating text around the JSON
+def parse_answers(reply):
+    start, end = reply.find("["), reply.rfind("]")
+    if start != -1 and end > start:
+        try:
+            answers = json.loads(reply[start:end + 1])
+            return [str(answer).strip() for answer in answers if str(answer).strip()]
+        except json.JSONDecodeError:
+            pass
+    return [line.strip(" -*\t") for line in reply.splitlines() if line.strip(" -*\t")]
+
+
+def generate_reference_answers(questions, get_answer, count=3, workers=4, existing=None):
+    references = dict(existing or {})
+    pending = [question for question in questions if question not in references]
+
+    def generate(question):
+        reply = get_answer([{"role": "user", "content": question}], REFERENCE_PROMPT.format(count=count))
+        return question, parse_answers(reply)[:count]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for question, answers in pool.map(generate, pending):
+            references[question] = answers
+    return references
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate reference answers for every question in a koshen.json-style file.")
+    parser.add_argument("--questions", default="koshen.json")
+    parser.add_argument("--output", default="reference_answers.json")
+    parser.add_argument("--per-question", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    from utils import get_answer
+    from utilities.embeddings import cached_encoder
+    from utilities.models import DEFAULT_MODEL_NAME, encoder_id, get_batching_encoder
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions_data = json.load(f)
+    questions = [question for levels in questions_data.values() for level_questions in levels.values() for question in level_questions]
+
+    existing = None
+    if os.path.exists(args.output):
+        with open(args.output, encoding="utf-8") as f:
+            existing = json.load(f)
+    references = generate_reference_answers(questions, get_answer, args.per_question, args.workers, existing)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(references, f, ensure_ascii=False, indent=4)
+
+    # Precompute the embeddings now so the app never encodes references at request time
+    encoder = cached_encoder(get_batching_encoder(DEFAULT_MODEL_NAME), encoder_id(DEFAULT_MODEL_NAME))
+    ReferenceStore(args.output, encoder.encode_many, encoder.model_name)
+    print(f"Wrote {sum(len(a) for a in references.values())} reference answers for {len(references)} questions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utilities.embeddings import cosine_similarity_matrix, normalize_text
+
+
+# Helper function to build the exact-tier key from the normalized prompt, messages and model
+def response_key(system_prompt, messages, model):
+    payload = json.dumps(
+        [normalize_text(system_prompt), [[m["role"], normalize_text(m["content"])] for m in messages], model],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Opt-in two-tier cache for deterministic LLM prompts such as judge calls.
+
+    The exact tier matches on the normalized (system prompt, messages, model).
+    The semantic tier is consulted only when the caller passes a scope and a
+    semantic_text: within one scope (e.g. the reference answer being judged),
+    a previous response is reused when the embedding of the new text is at
+    least similarity_threshold cosine-similar to a cached one.
+
+    :param embed: Callable mapping a list of texts to an embedding matrix; required for the semantic tier.
+    :param max_entries: Maximum exact entries, and maximum semantic entries per scope.
+    :param ttl_seconds: Lifetime of every entry.
+    :param similarity_threshold: Minimum cosine similarity for a semantic hit.
+    """
+
+    def __init__(self, embed=None, max_entries=1024, ttl_seconds=3600, similarity_threshold=0.92, max_scopes=1024):
+        self.embed = embed
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.max_scopes = max_scopes
+        self._exact = OrderedDict()
+        self._semantic = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _semantic_vector(self, semantic_text):
+        return np.asarray(self.embed([semantic_text])[0], dtype=np.float32)
+
+    def get(self, system_prompt, messages, model, scope=None, semantic_text=None):
+        key = response_key(system_prompt, messages, model)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is not None:
+                response, expires = entry
+                if expires > now:
+                    self._exact.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._exact[key]
+
+        if self.embed is not None and scope is not None and semantic_text:
+            vector = self._semantic_vector(semantic_text)
+            with self._lock:
+                entries = [e for e in self._semantic.get(scope, []) if e[2] > now]
+                if entries:
+                    self._semantic[scope] = entries
+                    scores = cosine_similarity_matrix(vector, np.vstack([e[0] for e in entries]))[0]
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        self.semantic_hits += 1
+                        return entries[best][1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, system_prompt, messages, model, response, scope=None, semantic_text=None):
+        key = response_key(system_prompt, messages, model)
+        expires = time.monotonic() + self.ttl_seconds
+        vector = None
+        if self.embed is not None and scope is not None and semantic_text:
+            vector = self._semantic_vector(semantic_text)
+
+        with self._lock:
+            self._exact[key] = (response, expires)
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+
+            if vector is not None:
+                entries = self._semantic.setdefault(scope, [])
+                entries.append((vector, response, expires))
+                del entries[:-self.max_entries]
+                self._semantic.move_to_end(scope)
+                while len(self._semantic) > self.max_scopes:
+                    self._semantic.popitem(last=False)
@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+from utilities.metrics import LatencyHistogram
+
+
+class ChatProvider:
+    """
+    A streaming chat-completions backend (Groq, OpenAI or anything API-compatible).
+
+    :param name: Label used for latency histograms.
+    :param client: An AsyncGroq/AsyncOpenAI client; point its base_url at a stub server to test.
+    :param model: Model name sent with every request.
+    """
+
+    def __init__(self, name, client, model):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.first_token_latency = LatencyHistogram(decay=0.99)
+
+    async def stream(self, messages):
+        stream = await self.client.chat.completions.create(model=self.model, messages=messages, stream=True)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+class _Attempt:
+    def __init__(self, provider, messages):
+        self.provider = provider
+        self.queue = asyncio.Queue()
+        self.started = time.perf_counter()
+        self.measured = False
+        self.task = asyncio.ensure_future(self._pump(messages))
+
+    async def _pump(self, messages):
+        try:
+            async for token in self.provider.stream(messages):
+                if not self.measured:
+                    self.measured = True
+                    self.provider.first_token_latency.record(time.perf_counter() - self.started)
+                await self.queue.put(token)
+            await self.queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            await self.queue.put(_Failed(error))
+
+    def cancel(self):
+        # A request that lost the race took at least this long to its first token; dropping it would
+        # leave only the fast requests in the histogram and pull the hedge delay down
+        if not self.measured and not self.task.done():
+            self.measured = True
+            self.provider.first_token_latency.record(time.perf_counter() - self.started)
+        self.task.cancel()
+
+
+class HedgedRouter:
+    """
+    Sends a chat request to the primary provider and, if no token has arrived
+    within the hedge delay (or the primary fails), a duplicate to the secondary.
+    Whichever produces the first token wins and the other request is cancelled.
+
+    The hedge delay is the primary's time-to-first-token quantile over its
+    recent requests, clamped to [min_delay, max_delay]; requests cancelled
+    before their first token count with their elapsed time as a lower bound.
+    default_delay is used until min_samples requests have been measured.
+    """
+
+    def __init__(self, primary, secondary=None, quantile=0.95, default_delay=2.0, min_delay=0.25, max_delay=8.0, min_samples=20):
+        self.primary = primary
+        self.secondary = secondary
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.hedges = 0
+        self.wins = {primary.name: 0}
+        if secondary is not None:
+            self.wins[secondary.name] = 0
+
+    def hedge_delay(self):
+        histogram = self.primary.first_token_latency
+        if histogram.total < self.min_samples:
+            return self.default_delay
+        return min(max(histogram.quantile(self.quantile), self.min_delay), self.max_delay)
+
+    async def stream(self, messages):
+        attempts = [_Attempt(self.primary, messages)]
+        waiting = {asyncio.ensure_future(attempts[0].queue.get()): attempts[0]}
+        winner, item, error = None, None, None
+
+        def hedge():
+            attempt = _Attempt(self.secondary, messages)
+            attempts.append(attempt)
+            waiting[asyncio.ensure_future(attempt.queue.get())] = attempt
+
+        try:
+            timeout = self.hedge_delay() if self.secondary is not None else None
+            while winner is None:
+                if not waiting:
+                    raise error
+                done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                timeout = None
+                if not done:
+                    self.hedges += 1
+                    hedge()
+                    continue
+                for getter in done:
+                    attempt = waiting.pop(getter)
+                    result = getter.result()
+                    if isinstance(result, _Failed):
+                        error = result.error
+                        if len(attempts) == 1 and self.secondary is not None:
+                            hedge()
+                        continue
+                    winner, item = attempt, result
+                    break
+
+            self.wins[winner.provider.name] += 1
+            for getter in waiting:
+                getter.cancel()
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+
+            while item is not _DONE:
+                if isinstance(item, _Failed):
+                    raise item.error
+                yield item
+                item = await winner.queue.get()
+        finally:
+            for getter in waiting:
+                getter.cancel()
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def get_answer(self, messages):
+        return "".join([token async for token in self.stream(messages)])
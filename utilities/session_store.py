@@ -0,0 +1,210 @@
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SessionStore:
+    """
+    Interface for interview-state backends.
+
+    States are JSON-serializable dicts stamped with a per-session version that
+    increases with every save; a backend must never replace a stored state
+    with one of an equal or lower version, so a stale replica cannot roll a
+    session back.
+    """
+
+    def load(self, session_id):
+        """Return (version, state) for the session, or None if it is unknown."""
+        raise NotImplementedError
+
+    def save(self, session_id, version, state):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store, for single-replica setups and tests of the interface."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            found = self._sessions.get(session_id)
+        return None if found is None else (found[0], json.loads(found[1]))
+
+    def save(self, session_id, version, state):
+        encoded = json.dumps(state)
+        with self._lock:
+            found = self._sessions.get(session_id)
+            if found is None or version > found[0]:
+                self._sessions[session_id] = (version, encoded)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite store in WAL mode, shared by replicas running on the same host.
+
+    WAL relies on shared memory between the processes using the database, so
+    it does not work over network filesystems; replicas spread across hosts
+    need a networked backend added with register_store.
+
+    Saves are write-behind: they replace the session's pending snapshot and a
+    background thread writes all pending sessions in one transaction every
+    flush_interval seconds, so a burst of mutations in one rerun costs a
+    single row write. Loads see pending snapshots of this process first.
+
+    :param path: Database file.
+    :param flush_interval: Seconds between background flushes.
+    """
+
+    def __init__(self, path, flush_interval=0.1):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.conflicts = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, version INTEGER NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.commit()
+
+        self._writer = threading.Thread(target=self._flush_forever, name="session-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # WAL keeps readers off the writer's lock; NORMAL sync is durable across process crashes in WAL mode
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def load(self, session_id):
+        with self._lock:
+            pending = self._pending.get(session_id)
+        if pending is not None:
+            version, encoded = pending
+            return None if encoded is None else (version, json.loads(encoded))
+        row = self._connection().execute("SELECT version, state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def save(self, session_id, version, state):
+        encoded = json.dumps(state, ensure_ascii=False)
+        with self._lock:
+            pending = self._pending.get(session_id)
+            if pending is None or version > pending[0]:
+                self._pending[session_id] = (version, encoded)
+        self._wake.set()
+
+    def delete(self, session_id):
+        # A deletion is queued like a save so it cannot be overtaken by an older pending snapshot
+        with self._lock:
+            self._pending[session_id] = (float("inf"), None)
+        self._wake.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            now = time.time()
+            upserts = [(session_id, version, encoded, now) for session_id, (version, encoded) in pending.items() if encoded is not None]
+            deletes = [(session_id,) for session_id, (_, encoded) in pending.items() if encoded is None]
+            connection = self._connection()
+            with connection:
+                before = connection.total_changes
+                connection.executemany(
+                    "INSERT INTO sessions (id, version, state, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET version = excluded.version, state = excluded.state, updated_at = excluded.updated_at "
+                    "WHERE excluded.version > sessions.version",
+                    upserts,
+                )
+                # Rows skipped by the version check were written by another replica with a newer state
+                self.conflicts += len(upserts) - (connection.total_changes - before)
+                connection.executemany("DELETE FROM sessions WHERE id = ?", deletes)
+
+    def _flush_forever(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self.flush()
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+_factories = {
+    "sqlite": lambda: SQLiteSessionStore(
+        os.getenv("SESSION_STORE_PATH", os.path.join(".cache", "sessions.sqlite3")),
+        flush_interval=float(os.getenv("SESSION_STORE_FLUSH_MS", "100")) / 1000.0,
+    ),
+    "memory": MemorySessionStore,
+}
+_store = None
+_lock = threading.Lock()
+
+
+# Function to sign a session id for a URL, bound to the user it belongs to so a leaked link cannot resume it for anyone else
+def sign_session_id(session_id, secret, user=""):
+    signature = hmac.new(secret.encode("utf-8"), f"{user}\n{session_id}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{session_id}.{signature}"
+
+
+# Function to get the session id back from a signed one, or None when the signature does not match this user
+def verify_session_id(signed, secret, user=""):
+    session_id, _, signature = (signed or "").rpartition(".")
+    if session_id and hmac.compare_digest(sign_session_id(session_id, secret, user), signed):
+        return session_id
+    return None
+
+
+# Function to make another backend (e.g. Redis or Postgres) selectable through SESSION_STORE
+def register_store(name, factory):
+    _factories[name] = factory
+
+
+# Function to get the process-wide session store chosen by SESSION_STORE (default "sqlite")
+def get_session_store():
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = _factories[os.getenv("SESSION_STORE", "sqlite")]()
+    return _store
@@ -0,0 +1,130 @@
+import importlib.util
+import io
+import os
+import threading
+import wave
+
+# Clips up to this length are transcribed locally when a local engine is available
+SHORT_CLIP_SECONDS = float(os.getenv("STT_SHORT_CLIP_SECONDS", "6"))
+
+# Backend used per Paths question type (or page); "auto" routes by clip length
+QUESTION_TYPE_BACKENDS = {
+    "speakOutLoud": "auto",
+    "voiceQuiz": "auto",
+    "video": "auto",
+    "pictureQuiz": "auto",
+    "pictureDescription": "remote",
+    "botTalk": "remote",
+    "interview": "remote",
+}
+
+
+class RemoteBackend:
+    """
+    Transcription through a hosted API.
+
+    :param transcribe_fn: Callable (audio_bytes, filename) -> text.
+    """
+
+    def __init__(self, transcribe_fn):
+        self.transcribe_fn = transcribe_fn
+
+    def available(self):
+        return True
+
+    def transcribe(self, audio_bytes, filename="audio.wav"):
+        return self.transcribe_fn(audio_bytes, filename)
+
+
+class LocalWhisperBackend:
+    """
+    CPU transcription with a quantized faster-whisper model.
+
+    The model is loaded on first use and shared by every session in the process.
+
+    :param model_size: faster-whisper model name, e.g. "tiny.en" or "base.en".
+    :param compute_type: CTranslate2 compute type; "int8" keeps it small and fast on CPU.
+    """
+
+    def __init__(self, model_size="base.en", compute_type="int8", cpu_threads=0):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        return importlib.util.find_spec("faster_whisper") is not None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from faster_whisper import WhisperModel
+
+                    self._model = WhisperModel(
+                        self.model_size,
+                        device="cpu",
+                        compute_type=self.compute_type,
+                        cpu_threads=self.cpu_threads,
+                    )
+        return self._model
+
+    def transcribe(self, audio_bytes, filename="audio.wav"):
+        segments, _ = self._get_model().transcribe(io.BytesIO(audio_bytes), beam_size=1)
+        return "".join(segment.text for segment in segments).strip()
+
+
+_backends = {}
+
+
+def register_backend(name, backend):
+    _backends[name] = backend
+
+
+def get_backend(name):
+    if name not in _backends:
+        raise KeyError(f"Unknown speech-to-text backend: {name}")
+    return _backends[name]
+
+
+def backend_for(question_type):
+    return QUESTION_TYPE_BACKENDS.get(question_type, "auto")
+
+
+# Helper function to read the length of a WAV clip, or None for other formats
+def clip_duration(audio_bytes):
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as clip:
+            return clip.getnframes() / float(clip.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+
+
+# Function to pick the backend for a clip: an explicit name, or "auto" for local-if-short
+def select_backend(audio_bytes, backend="auto"):
+    if backend != "auto":
+        return get_backend(backend)
+    local = _backends.get("local")
+    duration = clip_duration(audio_bytes)
+    if local is not None and local.available() and duration is not None and duration <= SHORT_CLIP_SECONDS:
+        return local
+    return get_backend("remote")
+
+
+def transcribe(audio_bytes, filename="audio.wav", backend="auto"):
+    selected = select_backend(audio_bytes, backend)
+    if backend == "auto" and selected is not _backends.get("remote"):
+        try:
+            return selected.transcribe(audio_bytes, filename)
+        except Exception:
+            # A broken local engine should never cost the user their answer
+            return get_backend("remote").transcribe(audio_bytes, filename)
+    return selected.transcribe(audio_bytes, filename)
+
+
+register_backend("local", LocalWhisperBackend(
+    model_size=os.getenv("STT_LOCAL_MODEL", "base.en"),
+    compute_type=os.getenv("STT_LOCAL_COMPUTE_TYPE", "int8"),
+    cpu_threads=int(os.getenv("STT_LOCAL_THREADS", "0")),
+))
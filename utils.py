@@ -1,21 +1,35 @@
-from openai import OpenAI
 import os
-from groq import Groq
 from dotenv import load_dotenv
+# Loaded before the utilities imports below, which read their settings from the environment
+load_dotenv()
+import asyncio
 import base64
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-import streamlit as st
+import streamlit.components.v1 as components
 import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
+from utilities.audio_cache import AudioCache, audio_key
+from utilities.audio_server import CONTENT_TYPES, get_audio_server
+from utilities.clients import AsyncClients
+from utilities.router import ChatProvider, HedgedRouter
+from utilities import stt
+from utilities.audio_preprocess import encode_for_upload, preprocess_audio
+from utilities import metrics
+from utilities.metrics import timed
 
 # Load configuration
+@timed("utils.load_config")
 def load_config(config_path='config.yaml'):
     with open(config_path) as file:
         config = yaml.load(file, Loader=SafeLoader)
     return config
 
 # Initialize authenticator
+@timed("utils.init_authenticator")
 def init_authenticator(config):
     authenticator = stauth.Authenticate(
         config['credentials'],
@@ -26,49 +40,198 @@ def init_authenticator(config):
     )
     return authenticator
 
-load_dotenv()
+CHAT_MODEL = "LLaMA3-70b-8192"
+FALLBACK_CHAT_MODEL = os.getenv("FALLBACK_CHAT_MODEL", "gpt-4o-mini")
+
+# Spans are only recorded with METRICS_ENABLED=1; METRICS_PORT serves /metrics, METRICS_DUMP_PATH writes JSON periodically
+metrics.start_exporters()
 api_key = os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(api_key=api_key)
+# Async clients share one tuned keep-alive connection pool
+async_clients = AsyncClients(api_key, os.getenv("GROQ_API_KEY"))
+
+# Chat completions go to Groq first and are hedged to OpenAI when Groq is slow to produce its first token
+chat_router = HedgedRouter(
+    ChatProvider("groq", async_clients.groq, CHAT_MODEL),
+    ChatProvider("openai", async_clients.openai, FALLBACK_CHAT_MODEL) if os.getenv("HEDGE_CHAT", "1") == "1" else None
+)
+
+# Streamlit serves this directory same-origin at /app/static/ when server.enableStaticServing is on (.streamlit/config.toml)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Synthesized audio is content-addressed, so static prompts are only sent to the TTS API once per deployment
+tts_cache = AudioCache(
+    os.getenv("TTS_CACHE_DIR", os.path.join(STATIC_DIR, "tts")),
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+)
 
-groq = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Shared pool that bounds how many TTS requests run at once across all sessions
+tts_pool = ThreadPoolExecutor(max_workers=int(os.getenv("TTS_WORKERS", "4")), thread_name_prefix="tts")
 
-def get_answer(messages, system_prompt):
+@timed("utils.get_answer_async")
+async def get_answer_async(messages, system_prompt):
     system_message = [{"role": "system", "content": system_prompt}]
-    messages = system_message + messages
-    response = groq.chat.completions.create(
-        model="LLaMA3-70b-8192",
-        messages=messages
-    )
-    return response.choices[0].message.content
-
-def speech_to_text(audio_data):
-    with open(audio_data, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            response_format="text",
-            file=audio_file
-        )
-    return transcript
-
-def text_to_speech(input_text):
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice="nova",
-        input=input_text
-    )
-    webm_file_path = "temp_audio_play.mp3"
-    with open(webm_file_path, "wb") as f:
-        response.stream_to_file(webm_file_path)
-    return webm_file_path
+    return await chat_router.get_answer(system_message + messages)
 
-def autoplay_audio(file_path: str):
+# Pass a ResponseCache to reuse answers of deterministic prompts; scope/semantic_text enable its semantic tier
+@timed("utils.get_answer")
+def get_answer(messages, system_prompt, cache=None, scope=None, semantic_text=None):
+    if cache is None:
+        return async_clients.run(get_answer_async(messages, system_prompt))
+    answer = cache.get(system_prompt, messages, CHAT_MODEL, scope, semantic_text)
+    if answer is None:
+        answer = async_clients.run(get_answer_async(messages, system_prompt))
+        cache.put(system_prompt, messages, CHAT_MODEL, answer, scope, semantic_text)
+    return answer
+
+# Function to fold older turns into a short running summary for the context manager
+@timed("utils.summarize_conversation")
+def summarize_conversation(previous_summary, messages):
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    system_prompt = "Summarize this conversation between an interviewer (assistant) and a candidate (user) in at most five sentences. Keep the questions asked, how the candidate answered and anything the interviewer should remember. Reply with the summary only."
+    if previous_summary:
+        transcript = f"Summary so far: {previous_summary}\n{transcript}"
+    return get_answer([{"role": "user", "content": transcript}], system_prompt)
+
+# Function to stream the answer token by token; stops early and closes the connection if stop_event is set
+@timed("utils.stream_answer")
+def stream_answer(messages, system_prompt, stop_event=None):
+    system_message = [{"role": "system", "content": system_prompt}]
+    tokens = chat_router.stream(system_message + messages)
+    try:
+        while stop_event is None or not stop_event.is_set():
+            try:
+                yield async_clients.run(tokens.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        # Closing the router stream cancels any in-flight provider request
+        async_clients.run(tokens.aclose())
+
+# Helper function to turn a file path, raw bytes/memoryview or a binary buffer such as BytesIO into bytes
+@timed("utils.read_audio")
+def read_audio(audio_data, filename="audio.wav"):
+    if isinstance(audio_data, (str, os.PathLike)):
+        filename = os.path.basename(audio_data)
+        with open(audio_data, "rb") as audio_file:
+            return audio_file.read(), filename
+    if hasattr(audio_data, "read"):
+        return audio_data.read(), filename
+    return bytes(audio_data), filename
+
+@timed("utils.remote_speech_to_text")
+def remote_speech_to_text(audio_bytes, filename="audio.wav"):
+    audio_bytes, filename = encode_for_upload(audio_bytes, filename, os.getenv("AUDIO_UPLOAD_CODEC", "wav"))
+    return async_clients.run(async_clients.speech_to_text(audio_bytes, filename))
+
+stt.register_backend("remote", stt.RemoteBackend(remote_speech_to_text))
+
+# Function to transcribe audio; backend is a registered name ("remote", "local") or "auto" to send short clips to the local engine
+@timed("utils.speech_to_text")
+def speech_to_text(audio_data, filename="audio.wav", backend="auto"):
+    audio_bytes, filename = read_audio(audio_data, filename)
+    # Silence is trimmed and the clip shrunk to 16 kHz mono before any backend sees it; pure silence never leaves the server
+    if os.getenv("AUDIO_PREPROCESS", "1") == "1":
+        audio_bytes = preprocess_audio(audio_bytes)
+        if audio_bytes is None:
+            return ""
+    return stt.transcribe(audio_bytes, filename, backend)
+
+@timed("utils.speech_to_text_async")
+async def speech_to_text_async(audio_data, filename="audio.wav", backend="auto"):
+    return await asyncio.to_thread(speech_to_text, audio_data, filename, backend)
+
+# Function to get the path of the cached clip for a text, synthesizing it on a miss
+@timed("utils.text_to_speech_async")
+async def text_to_speech_async(input_text, voice="nova", model="tts-1", response_format="mp3"):
+    key = audio_key(input_text, voice, model, response_format)
+    file_path = tts_cache.get(key, response_format)
+    if file_path is None:
+        data = await async_clients.text_to_speech(input_text, voice, model, response_format)
+        file_path = tts_cache.put(key, data, response_format)
+    return file_path
+
+@timed("utils.text_to_speech")
+def text_to_speech(input_text, voice="nova", model="tts-1", response_format="mp3"):
+    return async_clients.run(text_to_speech_async(input_text, voice, model, response_format))
+
+# Function to get the URL the browser should fetch a cached clip from: the side server only when
+# AUDIO_PUBLIC_URL names it, else Streamlit's own static route, else the clip inlined as a data URI
+@timed("utils.audio_url")
+def audio_url(file_path: str):
+    if os.getenv("AUDIO_PUBLIC_URL"):
+        return get_audio_server(tts_cache.cache_dir).url_for(file_path)
+    file_path = os.path.abspath(file_path)
+    if st.get_option("server.enableStaticServing") and os.path.commonpath([file_path, STATIC_DIR]) == STATIC_DIR:
+        parts = [st.get_option("server.baseUrlPath").strip("/"), "app/static", os.path.relpath(file_path, STATIC_DIR).replace(os.sep, "/")]
+        return "/" + "/".join(part for part in parts if part)
     with open(file_path, "rb") as f:
-        data = f.read()
-    b64 = base64.b64encode(data).decode("utf-8")
+        encoded = base64.b64encode(f.read()).decode("ascii")
+    return f"data:{CONTENT_TYPES.get(file_path.rsplit('.', 1)[-1], 'audio/mpeg')};base64,{encoded}"
+
+@timed("utils.autoplay_audio")
+def autoplay_audio(file_path: str):
     md = f"""
     <audio autoplay>
-    <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
+    <source src="{audio_url(file_path)}" type="audio/mp3">
     </audio>
     """
-    st.markdown(md, unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(md, unsafe_allow_html=True)
+
+# Helper function to split a reply into sentences for pipelined synthesis
+@timed("utils.split_sentences")
+def split_sentences(text):
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return [sentence for sentence in sentences if sentence]
+
+# Function to synthesize a reply sentence by sentence; segments are produced concurrently but yielded in order
+@timed("utils.text_to_speech_pipelined")
+def text_to_speech_pipelined(input_text):
+    futures = [tts_pool.submit(text_to_speech, sentence) for sentence in split_sentences(input_text)]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+# The player lives in the parent page so queued segments keep playing across Streamlit reruns
+AUDIO_QUEUE_SCRIPT = """
+<script>
+const host = window.parent;
+if (!host.__ttsPlayer) {
+    host.__ttsPlayer = new host.Function(`
+        const audio = new Audio();
+        const queue = [];
+        const playNext = () => {
+            if (!audio.paused && !audio.ended) return;
+            const src = queue.shift();
+            if (src) {
+                audio.src = src;
+                audio.play().catch(playNext);
+            }
+        };
+        audio.addEventListener("ended", playNext);
+        audio.addEventListener("error", playNext);
+        return {
+            reset() { queue.length = 0; audio.pause(); audio.removeAttribute("src"); },
+            push(src) { queue.push(src); playNext(); }
+        };
+    `)();
+}
+if (RESET) host.__ttsPlayer.reset();
+host.__ttsPlayer.push(SOURCE);
+</script>
+"""
+
+@timed("utils.queue_audio")
+def queue_audio(file_path, reset=False):
+    script = AUDIO_QUEUE_SCRIPT.replace("RESET", "true" if reset else "false")
+    script = script.replace("SOURCE", json.dumps(audio_url(file_path)))
+    components.html(script, height=0)
+
+# Function to play pipelined segments back to back, replacing whatever the previous turn queued
+@timed("utils.play_audio_segments")
+def play_audio_segments(segments):
+    for index, file_path in enumerate(segments):
+        queue_audio(file_path, reset=index == 0)
@@ -1,10 +1,18 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, abort, render_template, request, jsonify, session, send_file, stream_with_context, url_for
+import json
 import os
-from utils import get_answer, text_to_speech, speech_to_text, semantic_similarity
+import re
+from utils import audio_store, get_answer, stream_answer, text_to_speech, speech_to_text, semantic_similarity
 from models.sentence_transformer import SentenceTransformerModel
+from server_session import SQLiteSessionInterface
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
+# Session data stays on the server; the cookie only carries a signed session id
+app.session_interface = SQLiteSessionInterface(
+    os.getenv("FLASK_SESSION_DB", os.path.join(os.path.dirname(__file__), ".cache", "sessions.sqlite3")),
+    ttl=int(os.getenv("FLASK_SESSION_TTL", str(24 * 3600))),
+)
 
 # Initialize the NLP model for semantic similarity
 model = SentenceTransformerModel()
@@ -43,14 +51,12 @@ EVALUATION_THRESHOLD = 0.4
 def index():
     return render_template('index.html', scenarios=scenarios, levels=levels)
 
-@app.route('/chat', methods=['POST'])
-def chat():
-    data = request.get_json()
-    scenario = data.get('scenario')
-    level = data.get('level')
-    user_input = data.get('message')
+@app.route('/chat', methods=['GET'])
+def chat_page():
+    return render_template('chat.html')
 
-    # Initialize session variables if they don't exist
+# Helper function to initialize session variables if they don't exist
+def initialize_session(scenario, level):
     if 'messages' not in session:
         session['messages'] = [{"role": "assistant", "content": content[scenario]["Beginner"]}]
     if 'selected_scenario' not in session:
@@ -72,27 +78,101 @@ def chat():
     if 'user_introduction' not in session:
         session['user_introduction'] = ""
 
+# Helper function to record the user's message and build the system prompt for the reply
+def record_user_input(scenario, user_input):
+    session['messages'].append({"role": "user", "content": user_input})
+    if session['introduction_given']:
+        session['answers'].append(user_input)
+    else:
+        session['user_introduction'] = user_input
+        session['introduction_given'] = True
+    return scenarios[scenario][session['level_progress'][scenario]].format(max_questions=session['max_questions'])
+
+def audio_url(file_path):
+    return url_for('audio', audio_id=os.path.splitext(os.path.basename(file_path))[0])
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    data = request.get_json()
+    scenario = data.get('scenario')
+    level = data.get('level')
+    user_input = data.get('message')
+
+    initialize_session(scenario, level)
+
     if user_input:
-        session['messages'].append({"role": "user", "content": user_input})
-        if session['introduction_given']:
-            session['answers'].append(user_input)
-        else:
-            session['user_introduction'] = user_input
-            session['introduction_given'] = True
-
-        system_prompt = scenarios[scenario][session['level_progress'][scenario]].format(max_questions=session['max_questions'])
+        system_prompt = record_user_input(scenario, user_input)
         final_response = get_answer(session['messages'], system_prompt)
         audio_file = text_to_speech(final_response)
         session['messages'].append({"role": "assistant", "content": final_response})
 
-        return jsonify({"response": final_response, "audio": audio_file})
+        return jsonify({"response": final_response, "audio": audio_url(audio_file)})
 
     return jsonify({"response": "Error: No input received."})
 
+# Helper function to format one Server-Sent Event
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.get_json()
+    scenario = data.get('scenario')
+    level = data.get('level')
+    user_input = data.get('message')
+
+    initialize_session(scenario, level)
+
+    if not user_input:
+        return jsonify({"response": "Error: No input received."}), 400
+
+    system_prompt = record_user_input(scenario, user_input)
+    messages = list(session['messages'])
+
+    # Tokens are pushed as they arrive; synthesis starts only once the full reply is known
+    @stream_with_context
+    def events():
+        tokens = []
+        try:
+            for token in stream_answer(messages, system_prompt):
+                tokens.append(token)
+                yield sse("token", {"text": token})
+        except Exception as error:
+            yield sse("error", {"message": str(error)})
+            return
+        final_response = "".join(tokens)
+        # The session was already saved when the response headers went out, so the reply is stored here
+        session['messages'].append({"role": "assistant", "content": final_response})
+        app.session_interface.save_now(session)
+        yield sse("done", {"response": final_response})
+        try:
+            yield sse("audio", {"url": audio_url(text_to_speech(final_response))})
+        except Exception as error:
+            yield sse("error", {"message": str(error)})
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        # Keeps nginx-style proxies from buffering the stream
+        "X-Accel-Buffering": "no",
+    })
+
+# Audio ids are content hashes, so a URL's bytes never change: clients may cache forever and seek with Range requests
+@app.route('/audio/<audio_id>.mp3')
+def audio(audio_id):
+    if not re.fullmatch(r"[0-9a-f]{64}", audio_id):
+        abort(404)
+    file_path = audio_store.get(audio_id)
+    if file_path is None:
+        abort(404)
+    response = send_file(file_path, mimetype='audio/mpeg', conditional=True, etag=audio_id, max_age=365 * 24 * 3600)
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/reset', methods=['POST'])
 def reset():
     session.clear()
     return jsonify({"status": "reset"})
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Each open /chat/stream holds a worker while it streams; in production run e.g. `gunicorn -k gevent app:app`
+    app.run(debug=True, threaded=True)
@@ -1,8 +1,15 @@
-from sentence_transformers import SentenceTransformer
+import os
+import sys
+
+# Share the model registry with the Streamlit app at the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from utilities.models import DEFAULT_MODEL_NAME, get_batching_encoder
 
 class SentenceTransformerModel:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        # Requests from concurrent Flask threads are batched into shared forward passes
+        self.model = get_batching_encoder(model_name)
 
     def encode(self, text, convert_to_tensor=False):
         return self.model.encode(text, convert_to_tensor=convert_to_tensor)
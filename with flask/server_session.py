@@ -0,0 +1,143 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, encoded=None, expires=0.0):
+        def on_update(session):
+            session.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.encoded = encoded
+        self.expires = expires
+
+
+# Helper functions for the stored form: minified JSON, zlib-compressed
+def encode_session(data):
+    return zlib.compress(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 6)
+
+
+def decode_session(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Keeps session data in a local SQLite database; the cookie only carries a
+    signed random session id, so its size stays constant however long the
+    interview gets.
+
+    Sessions expire ttl seconds after their last save. Data is saved whenever
+    its encoded form changed, which also catches in-place edits such as
+    session['messages'].append(...) that never mark a Flask session modified.
+
+    :param path: Database file.
+    :param ttl: Idle seconds before a session expires.
+    :param gc_interval: Minimum seconds between sweeps of expired rows.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, gc_interval=300):
+        self.path = path
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+        connection.commit()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="server-session")
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("ascii")
+            except BadSignature:
+                sid = None
+            if sid:
+                row = self._connection().execute("SELECT data, expires FROM sessions WHERE id = ?", (sid,)).fetchone()
+                if row is not None and row[1] > time.time():
+                    return ServerSession(decode_session(row[0]), sid=sid, encoded=bytes(row[0]), expires=row[1])
+        return ServerSession(sid=secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        connection = self._connection()
+
+        if not session:
+            if not session.new:
+                with connection:
+                    connection.execute("DELETE FROM sessions WHERE id = ?", (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        encoded = encode_session(dict(session))
+        # Unchanged sessions are only re-stamped (and their cookie renewed) once half their TTL has passed
+        if encoded == session.encoded and session.expires - now >= self.ttl / 2:
+            return
+        renew_cookie = session.new or session.expires - now < self.ttl / 2
+        self._write(connection, session, encoded, now)
+
+        if renew_cookie:
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode("ascii"),
+                max_age=self.ttl,
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    # Function to store a session from a streaming response, whose body runs after save_session already did
+    def save_now(self, session):
+        self._write(self._connection(), session, encode_session(dict(session)), time.time())
+
+    def _write(self, connection, session, encoded, now):
+        with connection:
+            connection.execute(
+                "INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires = excluded.expires",
+                (session.sid, encoded, now + self.ttl),
+            )
+        session.encoded = encoded
+        session.expires = now + self.ttl
+        self._collect_garbage(connection, now)
+
+    def _collect_garbage(self, connection, now):
+        if now - self._last_gc < self.gc_interval:
+            return
+        self._last_gc = now
+        with connection:
+            connection.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
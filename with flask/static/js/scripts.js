@@ -1,54 +1,102 @@
-document.getElementById('scenarioForm').addEventListener('submit', function(event) {
-    event.preventDefault();
-    const scenario = document.getElementById('scenario').value;
-    const level = document.getElementById('level').value;
-    sessionStorage.setItem('scenario', scenario);
-    sessionStorage.setItem('level', level);
-    window.location.href = '/chat';
-});
-
-document.getElementById('chatForm').addEventListener('submit', function(event) {
-    event.preventDefault();
-    const message = document.getElementById('message').value;
-    const scenario = sessionStorage.getItem('scenario');
-    const level = sessionStorage.getItem('level');
-
-    if (message.trim() === '') return;
-
-    appendMessage('user', message);
-
-    fetch('/chat', {
+const scenarioForm = document.getElementById('scenarioForm');
+if (scenarioForm) {
+    scenarioForm.addEventListener('submit', function(event) {
+        event.preventDefault();
+        const scenario = document.getElementById('scenario').value;
+        const level = document.getElementById('level').value;
+        sessionStorage.setItem('scenario', scenario);
+        sessionStorage.setItem('level', level);
+        window.location.href = '/chat';
+    });
+}
+
+const chatForm = document.getElementById('chatForm');
+if (chatForm) {
+    chatForm.addEventListener('submit', function(event) {
+        event.preventDefault();
+        const message = document.getElementById('message').value;
+        const scenario = sessionStorage.getItem('scenario');
+        const level = sessionStorage.getItem('level');
+
+        if (message.trim() === '') return;
+
+        appendMessage('user', message);
+        streamReply(scenario, level, message);
+
+        document.getElementById('message').value = '';
+    });
+}
+
+// Render the reply as its tokens arrive, then play the audio once the server has synthesized it
+async function streamReply(scenario, level, message) {
+    const messageDiv = appendMessage('assistant', '');
+    const response = await fetch('/chat/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({ scenario: scenario, level: level, message: message })
-    })
-    .then(response => response.json())
-    .then(data => {
-        appendMessage('assistant', data.response);
-        // Handle audio response
-        if (data.audio) {
-            const audio = new Audio(data.audio);
-            audio.play();
-        }
     });
+    if (!response.ok) {
+        const data = await response.json();
+        messageDiv.textContent = data.response;
+        return;
+    }
 
-    document.getElementById('message').value = '';
-});
-
-document.getElementById('resetButton').addEventListener('click', function() {
-    fetch('/reset', {
-        method: 'POST'
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.status === 'reset') {
-            sessionStorage.clear();
-            window.location.href = '/';
-        }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        // Events are separated by a blank line; keep any partial event for the next chunk
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        events.forEach(raw => handleEvent(parseEvent(raw), messageDiv));
+    }
+}
+
+function parseEvent(raw) {
+    let event = 'message';
+    const data = [];
+    raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
     });
-});
+    return { event: event, data: data.length ? JSON.parse(data.join('\n')) : null };
+}
+
+function handleEvent({ event, data }, messageDiv) {
+    const chatbox = document.getElementById('chatbox');
+    if (event === 'token') {
+        messageDiv.textContent += data.text;
+        chatbox.scrollTop = chatbox.scrollHeight;
+    } else if (event === 'done') {
+        messageDiv.textContent = data.response;
+    } else if (event === 'audio') {
+        const audio = new Audio(data.url);
+        audio.play();
+    } else if (event === 'error') {
+        console.error(data.message);
+    }
+}
+
+const resetButton = document.getElementById('resetButton');
+if (resetButton) {
+    resetButton.addEventListener('click', function() {
+        fetch('/reset', {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.status === 'reset') {
+                sessionStorage.clear();
+                window.location.href = '/';
+            }
+        });
+    });
+}
 
 function appendMessage(role, content) {
     const chatbox = document.getElementById('chatbox');
@@ -57,4 +105,5 @@ function appendMessage(role, content) {
     messageDiv.textContent = content;
     chatbox.appendChild(messageDiv);
     chatbox.scrollTop = chatbox.scrollHeight;
+    return messageDiv;
 }
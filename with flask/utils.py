@@ -1,24 +1,53 @@
 from openai import OpenAI
 import os
+import sys
 import base64
 from dotenv import load_dotenv
-from sentence_transformers import util
-import tempfile
+import numpy as np
+
+# Share the audio cache with the Streamlit app at the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utilities.audio_cache import AudioCache, audio_key
 
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
 client = OpenAI(api_key=api_key)
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+# Synthesized replies, stored under the hash of what was synthesized and served by the /audio route
+AUDIO_DIR = os.getenv("AUDIO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "audio"))
+audio_store = AudioCache(
+    AUDIO_DIR,
+    max_bytes=int(os.getenv("AUDIO_STORE_MAX_BYTES", str(256 * 1024 * 1024))),
+    ttl_seconds=int(os.getenv("AUDIO_STORE_TTL", str(24 * 3600))),
+)
+audio_store.start_collector(interval=float(os.getenv("AUDIO_STORE_GC_INTERVAL", "60")))
 
 def get_answer(messages, system_prompt):
     system_message = [{"role": "system", "content": system_prompt}]
     messages = system_message + messages
-    response = client.Completion.create(
-        model="text-davinci-003",
+    response = client.chat.completions.create(
+        model=CHAT_MODEL,
         messages=messages
     )
     return response.choices[0].message.content
 
+# Function to stream the reply token by token
+def stream_answer(messages, system_prompt):
+    system_message = [{"role": "system", "content": system_prompt}]
+    stream = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=system_message + messages,
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
 def speech_to_text(audio_data):
     with open(audio_data, "rb") as audio_file:
         transcript = client.audio.transcriptions.create(
@@ -28,19 +57,15 @@ def speech_to_text(audio_data):
         )
     return transcript
 
-def text_to_speech(input_text):
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice="nova",
-        input=input_text
-    )
-    webm_file_path = tempfile.mktemp(suffix=".mp3")
-    with open(webm_file_path, "wb") as f:
-        response.with_streaming_response().write_to_file(f)
-    return webm_file_path
+# Function to synthesize a reply once per distinct text and return its path in the audio store
+def text_to_speech(input_text, voice="nova", model="tts-1"):
+    def synthesize():
+        return client.audio.speech.create(model=model, voice=voice, input=input_text).content
+
+    return audio_store.get_or_create(audio_key(input_text, voice, model, "mp3"), synthesize)
 
 def semantic_similarity(user_answer, expected_answer, model):
-    embeddings1 = model.encode(user_answer, convert_to_tensor=True)
-    embeddings2 = model.encode(expected_answer, convert_to_tensor=True)
-    cosine_scores = util.pytorch_cos_sim(embeddings1, embeddings2)
-    return cosine_scores.item()
+    # numpy vectors work with both encoder backends, so the int8 ONNX one never needs torch
+    embeddings1 = model.encode(user_answer)
+    embeddings2 = model.encode(expected_answer)
+    return float(np.dot(embeddings1, embeddings2) / (np.linalg.norm(embeddings1) * np.linalg.norm(embeddings2)))